@@ -0,0 +1,68 @@
+"""渲染基准：对比逐行 drawString 与单文本对象两种正文渲染方式
+
+用法：
+    python -m benchmarks.bench_render [--pages 60 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.pdf_generator import PDFGenerator
+
+
+def _make_pages(generator: PDFGenerator, page_count: int, seed: int = 0) -> list[list[str]]:
+    """构造确定性的页面内容（混合代码行、空行与中文注释）"""
+    rnd = random.Random(seed)
+    samples = [
+        "def handle_request(self, request, *args, **kwargs):",
+        "    return self.render(request, context={'items': items})",
+        "    // 计算每页最大行数并缓存结果",
+        "}",
+        "",
+        "    for (int i = 0; i < count; ++i) { total += values[i]; }",
+        "import os",
+    ]
+    return [
+        [rnd.choice(samples) for _ in range(generator.lines_per_page)]
+        for _ in range(page_count)
+    ]
+
+
+def bench(page_count: int, use_text_object: bool, repeat: int = 3) -> dict:
+    """渲染指定页数并返回最佳耗时与输出大小"""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "bench.pdf")
+        generator = PDFGenerator(output, "基准测试软件", "V1.0")
+        generator.use_text_object = use_text_object
+        pages = _make_pages(generator, page_count)
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            generator.render(pages)
+            best = min(best, time.perf_counter() - start)
+        return {"pages": page_count, "text_object": use_text_object,
+                "seconds": best, "bytes": os.path.getsize(output)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="正文渲染方式基准对比")
+    parser.add_argument("--pages", type=int, nargs="+", default=[60, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    for page_count in args.pages:
+        legacy = bench(page_count, False, args.repeat)
+        text = bench(page_count, True, args.repeat)
+        print(f"{page_count:>6} 页  drawString: {legacy['seconds']:.3f}s {legacy['bytes'] / 1024:.0f}KB"
+              f"  |  文本对象: {text['seconds']:.3f}s {text['bytes'] / 1024:.0f}KB"
+              f"  |  加速 {legacy['seconds'] / max(text['seconds'], 1e-9):.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
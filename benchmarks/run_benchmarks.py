@@ -0,0 +1,143 @@
+"""基准测试套件：分别计时扫描、读取、去注释、换行排版与 PDF 生成
+
+用法：
+    python -m benchmarks.run_benchmarks --profile medium --output results.json
+    python -m benchmarks.run_benchmarks --profile medium --baseline baseline.json   # 与基线对比，回归时返回非零
+    python -m benchmarks.run_benchmarks --profile medium --save-baseline baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_repo import PROFILES, generate_repo
+from src.scanner import Scanner
+from src.pdf_generator import PDFGenerator
+
+
+def _timeit(fn: Callable[[], object], repeat: int) -> float:
+    """重复执行并返回最短耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_suite(repo_dir: str, work_dir: str, repeat: int) -> dict:
+    """对指定仓库执行全部基准，返回 {基准名: {seconds, ...}}"""
+    results = {}
+    scanner = Scanner(repo_dir)
+
+    files = scanner.scan_parallel()
+    results["scan_parallel"] = {"seconds": _timeit(scanner.scan_parallel, repeat), "files": len(files)}
+
+    contents = [Scanner.read_file_content(p) for p in files]
+    results["read_file_content"] = {
+        "seconds": _timeit(lambda: [Scanner.read_file_content(p) for p in files], repeat),
+        "bytes": sum(os.path.getsize(p) for p in files),
+    }
+
+    results["remove_code_comments"] = {
+        "seconds": _timeit(lambda: [Scanner.remove_code_comments(c, p.suffix) for c, p in zip(contents, files)], repeat),
+    }
+
+    file_contents = [(p.name, c) for p, c in zip(files, contents) if c.strip()]
+    generator = PDFGenerator(os.path.join(work_dir, "bench.pdf"), "基准测试软件", "V1.0")
+
+    source_lines = [line for name, c in file_contents for line in generator._iter_source_lines(name, c)]
+    results["wrap_line"] = {
+        "seconds": _timeit(lambda: [generator._wrap_line(line) for line in source_lines], repeat),
+        "lines": len(source_lines),
+    }
+    results["wrap_lines_batch"] = {
+        "seconds": _timeit(lambda: generator._wrap_lines(source_lines), repeat),
+        "lines": len(source_lines),
+    }
+
+    layout_all = lambda: list(generator._iter_pages(file_contents))
+    results["iter_pages"] = {"seconds": _timeit(layout_all, repeat), "pages": len(layout_all())}
+
+    results["generate"] = {"seconds": _timeit(lambda: generator.generate(file_contents), repeat)}
+
+    direct = PDFGenerator(os.path.join(work_dir, "bench_direct.pdf"), "基准测试软件", "V1.0", backend="direct")
+    results["generate_direct"] = {"seconds": _timeit(lambda: direct.generate(file_contents), repeat)}
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """与基线对比，返回超过阈值的回归描述列表"""
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if not base or base["seconds"] <= 0:
+            continue
+        ratio = current["seconds"] / base["seconds"]
+        status = "回归" if ratio > 1 + threshold else "正常"
+        print(f"  {name:<22} {base['seconds']:.4f}s -> {current['seconds']:.4f}s  ({ratio:.2f}x) {status}")
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {ratio:.2f}x")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="软著文档生成性能基准")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    parser.add_argument("--repo", help="使用已有目录而不是生成合成仓库")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="结果 JSON 输出路径")
+    parser.add_argument("--baseline", help="与该基线 JSON 对比")
+    parser.add_argument("--save-baseline", help="将本次结果保存为基线")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的相对变慢比例（默认 0.2 即 20%%）")
+    args = parser.parse_args(argv)
+
+    profile = PROFILES[args.profile]
+    with tempfile.TemporaryDirectory() as work_dir:
+        repo_dir = args.repo
+        repo_stats = None
+        if not repo_dir:
+            repo_dir = os.path.join(work_dir, "repo")
+            repo_stats = generate_repo(repo_dir, profile)
+
+        benchmarks = run_suite(repo_dir, work_dir, args.repeat)
+
+    results = {
+        "profile": args.profile if not args.repo else None,
+        "profile_params": profile.to_dict() if not args.repo else None,
+        "repo_stats": repo_stats,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "benchmarks": benchmarks,
+    }
+
+    for name, r in benchmarks.items():
+        print(f"{name:<22} {r['seconds']:.4f}s")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("profile") != results["profile"]:
+            print(f"警告：基线 profile ({baseline.get('profile')}) 与本次 ({results['profile']}) 不一致")
+        print("与基线对比：")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("发现性能回归：" + "，".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""确定性的合成代码仓库生成器，用于性能基准测试
+
+同一组参数与随机种子总是生成完全相同的目录结构与文件内容。
+"""
+import os
+import random
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class RepoProfile:
+    """合成仓库的参数"""
+    files: int = 500
+    depth: int = 4
+    dirs_per_level: int = 4
+    median_lines: int = 120
+    max_lines: int = 3000
+    cjk_ratio: float = 0.2        # 含中文注释/字符串的文件比例
+    gbk_ratio: float = 0.05       # 以 GBK 编码保存的文件比例（仅对含中文的文件生效）
+    minified_ratio: float = 0.02  # 单行超长（压缩后）的 JS 文件比例
+    seed: int = 20240101
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+PROFILES = {
+    "small": RepoProfile(files=200, depth=3),
+    "medium": RepoProfile(files=2000, depth=5),
+    "large": RepoProfile(files=10000, depth=7, dirs_per_level=5),
+}
+
+# 语言及其权重
+_LANGUAGES = [(".py", 30), (".js", 20), (".ts", 10), (".java", 10), (".c", 8), (".h", 4), (".go", 6), (".html", 5), (".css", 4), (".md", 3)]
+
+_IDENTIFIERS = ["value", "items", "config", "result", "handler", "index", "buffer", "request", "response", "context", "total", "count"]
+_CJK_PHRASES = ["计算每页最大行数", "读取配置文件并校验", "处理用户请求", "初始化数据库连接", "软件著作权源码文档", "缓存已解析的结果", "排除依赖目录"]
+
+
+def _ident(rnd: random.Random) -> str:
+    return f"{rnd.choice(_IDENTIFIERS)}_{rnd.randint(0, 99)}"
+
+
+def _comment_text(rnd: random.Random, cjk: bool) -> str:
+    if cjk and rnd.random() < 0.7:
+        return rnd.choice(_CJK_PHRASES)
+    return f"update {_ident(rnd)} before returning {_ident(rnd)}"
+
+
+def _python_lines(rnd: random.Random, n: int, cjk: bool) -> list[str]:
+    lines = [f'"""{_comment_text(rnd, cjk)}"""', "import os", ""]
+    indent = 0
+    for _ in range(n):
+        r = rnd.random()
+        pad = "    " * indent
+        if r < 0.1:
+            lines.append(f"{pad}# {_comment_text(rnd, cjk)}")
+        elif r < 0.18:
+            lines.append(f"def {_ident(rnd)}(self, {_ident(rnd)}):")
+            lines.append(f'    """{_comment_text(rnd, cjk)}"""')
+            indent = 1
+        elif r < 0.25:
+            lines.append("")
+        elif r < 0.3 and cjk:
+            lines.append(f'{pad}message = "{rnd.choice(_CJK_PHRASES)}"')
+        else:
+            lines.append(f"{pad}{_ident(rnd)} = {_ident(rnd)} + {rnd.randint(0, 1000)}  # {_comment_text(rnd, cjk)}" if rnd.random() < 0.2
+                         else f"{pad}{_ident(rnd)} = {_ident(rnd)}.get('{_ident(rnd)}', {rnd.randint(0, 1000)})")
+    return lines
+
+
+def _c_style_lines(rnd: random.Random, n: int, cjk: bool) -> list[str]:
+    lines = ["/*", f" * {_comment_text(rnd, cjk)}", " */"]
+    for _ in range(n):
+        r = rnd.random()
+        if r < 0.1:
+            lines.append(f"    // {_comment_text(rnd, cjk)}")
+        elif r < 0.15:
+            lines.append(f"    /* {_comment_text(rnd, cjk)} */")
+        elif r < 0.22:
+            lines.append("")
+        elif r < 0.3:
+            lines.append("}")
+        elif r < 0.35 and cjk:
+            lines.append(f'    const label = "{rnd.choice(_CJK_PHRASES)}";')
+        else:
+            lines.append(f"    {_ident(rnd)} = compute({_ident(rnd)}, {rnd.randint(0, 1000)}); // {_ident(rnd)}" if rnd.random() < 0.2
+                         else f"    if ({_ident(rnd)} > {rnd.randint(0, 100)}) {{ {_ident(rnd)}++; }}")
+    return lines
+
+
+def _html_lines(rnd: random.Random, n: int, cjk: bool) -> list[str]:
+    lines = ["<html>", "<body>"]
+    for _ in range(n):
+        if rnd.random() < 0.15:
+            lines.append(f"  <!-- {_comment_text(rnd, cjk)} -->")
+        else:
+            text = rnd.choice(_CJK_PHRASES) if cjk and rnd.random() < 0.3 else _ident(rnd)
+            lines.append(f'  <div class="{_ident(rnd)}">{text}</div>')
+    lines += ["</body>", "</html>"]
+    return lines
+
+
+def _minified_js(rnd: random.Random, n: int) -> list[str]:
+    parts = [f"var {_ident(rnd)}=function(a,b){{return a+b*{rnd.randint(0, 99)}}};" for _ in range(n * 4)]
+    return ["".join(parts)]
+
+
+def _file_lines(rnd: random.Random, ext: str, n: int, cjk: bool, minified: bool) -> list[str]:
+    if minified:
+        return _minified_js(rnd, n)
+    if ext == ".py":
+        return _python_lines(rnd, n, cjk)
+    if ext in (".html", ".md"):
+        return _html_lines(rnd, n, cjk)
+    return _c_style_lines(rnd, n, cjk)
+
+
+def generate_repo(root: str, profile: RepoProfile) -> dict:
+    """在 root 下生成合成仓库，返回统计信息"""
+    rnd = random.Random(profile.seed)
+    os.makedirs(root, exist_ok=True)
+
+    # 构造目录树（每层 dirs_per_level 个子目录）
+    dirs = [root]
+    frontier = [root]
+    for level in range(profile.depth):
+        next_frontier = []
+        for parent in frontier:
+            for i in range(profile.dirs_per_level if level < 2 else rnd.randint(0, profile.dirs_per_level)):
+                d = os.path.join(parent, f"pkg_{level}_{i}")
+                os.makedirs(d, exist_ok=True)
+                next_frontier.append(d)
+        dirs += next_frontier
+        frontier = next_frontier or frontier
+
+    # 噪声目录：应被扫描器排除
+    for noise in ("node_modules/lib", ".git/objects", "build"):
+        d = os.path.join(root, noise)
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, "ignored.js"), "w", encoding="utf-8") as f:
+            f.write("console.log('ignored');\n")
+
+    exts = [e for e, _ in _LANGUAGES]
+    weights = [w for _, w in _LANGUAGES]
+    stats = {"files": 0, "bytes": 0, "lines": 0, "cjk_files": 0, "gbk_files": 0, "minified_files": 0}
+    for i in range(profile.files):
+        ext = rnd.choices(exts, weights)[0]
+        minified = ext == ".js" and rnd.random() < profile.minified_ratio
+        cjk = rnd.random() < profile.cjk_ratio
+        gbk = cjk and rnd.random() < profile.gbk_ratio / max(profile.cjk_ratio, 1e-9)
+        n = min(profile.max_lines, max(1, int(rnd.lognormvariate(0, 1) * profile.median_lines)))
+
+        text = "\n".join(_file_lines(rnd, ext, n, cjk, minified)) + "\n"
+        data = text.encode("gbk" if gbk else "utf-8")
+        path = os.path.join(rnd.choice(dirs), f"module_{i}{'.min' if minified else ''}{ext}")
+        with open(path, "wb") as f:
+            f.write(data)
+
+        stats["files"] += 1
+        stats["bytes"] += len(data)
+        stats["lines"] += text.count("\n")
+        stats["cjk_files"] += cjk
+        stats["gbk_files"] += gbk
+        stats["minified_files"] += minified
+    return stats
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("用法: python -m benchmarks.synthetic_repo <目标目录> [small|medium|large]")
+        sys.exit(1)
+    print(generate_repo(sys.argv[1], PROFILES[sys.argv[2] if len(sys.argv) > 2 else "small"]))
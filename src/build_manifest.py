@@ -0,0 +1,103 @@
+import os
+import json
+import hashlib
+import pathlib
+from typing import Optional
+
+
+class BuildManifest:
+    """输出文件旁的构建指纹清单：输入与参数都未变化时可以直接跳过整个流水线
+
+    指纹包含有序的文件列表（相对路径、大小、mtime）、排除规则与去注释等生成参数、
+    软件名与版本号、本次实际解析到的字体（名称、路径与文件状态）与排版参数，以及生成器自身代码的版本。
+    回退到内置字体后安装了中文字体时解析结果随之变化，指纹不再一致。
+    """
+
+    # 清单格式版本，格式变化时递增以使旧清单失效
+    VERSION = 2
+
+    def __init__(self, output_path: str):
+        """定位输出文件对应的清单文件"""
+        self.output_path = output_path
+        self.path = self.default_path(output_path)
+
+    @staticmethod
+    def default_path(output_path: str) -> str:
+        """与输出 PDF 同目录的清单文件路径"""
+        return f"{os.path.splitext(output_path)[0]}.build.json"
+
+    @staticmethod
+    def _stamp(path) -> Optional[list[int]]:
+        """文件的 [大小, mtime]，不可访问时返回 None"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    @staticmethod
+    def code_version() -> str:
+        """生成器代码的版本：src 目录下各模块的大小与 mtime 摘要，代码更新后旧清单自动失效"""
+        src_dir = pathlib.Path(__file__).resolve().parent
+        digest = hashlib.sha1(str(BuildManifest.VERSION).encode("ascii"))
+        for path in sorted(src_dir.glob("*.py")):
+            digest.update(f"{path.name}|{BuildManifest._stamp(path)}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def fingerprint(self, project_dir: str, files: list[pathlib.Path], settings: dict,
+                    font_name: str, font_path: Optional[str], layout_key: str) -> dict:
+        """计算输入指纹：有序文件列表及其大小与 mtime、生成参数、字体、排版参数与代码版本"""
+        root = os.path.abspath(project_dir)
+        entries = []
+        for path in files:
+            entries.append([os.path.relpath(path, root), self._stamp(path)])
+        return {
+            "version": self.VERSION,
+            "code": self.code_version(),
+            "project_dir": root,
+            "settings": settings,
+            "font": {"name": font_name, "path": font_path, "stamp": self._stamp(font_path) if font_path else None},
+            "layout": layout_key,
+            "files": entries,
+        }
+
+    def load(self) -> Optional[dict]:
+        """读取清单，不存在或损坏时返回 None"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"读取构建清单失败: {e}")
+            return None
+        return data if isinstance(data, dict) and data.get("version") == self.VERSION else None
+
+    def match(self, fingerprint: dict) -> Optional[dict]:
+        """指纹（含字体与排版参数）与输出文件都与清单一致时返回上次的生成结果，否则返回 None"""
+        data = self.load()
+        if data is None or data.get("inputs") != fingerprint:
+            return None
+        if data.get("output") != self._stamp(self.output_path):
+            return None
+        return data.get("result")
+
+    def save(self, fingerprint: dict, result: dict) -> None:
+        """在生成完成后写入清单（先写临时文件再原子替换）"""
+        data = {
+            "version": self.VERSION,
+            "inputs": fingerprint,
+            "output": self._stamp(self.output_path),
+            "result": result,
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"写入构建清单失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
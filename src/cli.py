@@ -0,0 +1,146 @@
+"""命令行入口：无需图形界面即可生成软著源码文档
+
+用法示例：
+    python -m src.cli <项目目录> -n 软件名称 -v V1.0 -o output.pdf --strip-comments
+
+为保证冷启动速度，本模块不导入 tkinter，其余依赖均在用到时才导入。
+"""
+import argparse
+import os
+import sys
+import time
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="软著源码文档生成（命令行模式）")
+    parser.add_argument("project_dir", help="项目源码目录")
+    parser.add_argument("-n", "--name", required=True, help="软件全称")
+    parser.add_argument("-v", "--version", required=True, help="版本号，如 V1.0")
+    parser.add_argument("-o", "--output", required=True, help="输出 PDF 路径")
+    parser.add_argument("--exclude-dir", action="append", default=[], metavar="DIR", help="额外排除的目录名（可多次指定）")
+    parser.add_argument("--exclude-ext", action="append", default=[], metavar="EXT", help="额外排除的文件后缀，如 .md（可多次指定）")
+    parser.add_argument("--strip-comments", action="store_true", help="移除代码注释")
+    parser.add_argument("--processes", type=int, default=0, metavar="N", help="读取阶段使用的进程数，0 表示使用线程池（默认）")
+    parser.add_argument("--streaming", action="store_true", help="流式模式：各阶段并发执行，内存占用与输出规模相关")
+    parser.add_argument("--backend", choices=("reportlab", "direct"), default="reportlab",
+                        help="PDF 输出后端：reportlab（默认）或 direct（直接写出 PDF 对象，速度更快）")
+    parser.add_argument("--full", action="store_true", help="全量导出全部页面（不截取前后各 30 页），页面逐页写盘，内存占用恒定")
+    parser.add_argument("--render-processes", type=int, default=0, metavar="N",
+                        help="渲染阶段使用的进程数，大于 1 时按页区间多进程渲染并合并为一个 PDF（使用 direct 后端，不支持 --streaming）")
+    parser.add_argument("--layout-processes", type=int, default=0, metavar="N",
+                        help="排版阶段使用的进程数，大于 1 时各文件的换行计算并行完成（不影响 --streaming）")
+    parser.add_argument("--estimate-pages", action="store_true",
+                        help="估算模式：只完整读取、去注释可能落入前后各 30 页的文件，中间文件按换行数估算总页数（不能与 --full、--streaming、--render-processes 同时使用）")
+    parser.add_argument("--page-index", action="store_true", help="在输出 PDF 旁保存页索引（.pageidx），记录每页起点供按页随机访问")
+    parser.add_argument("--force", action="store_true", help="忽略输出文件旁的构建清单，即使输入未变化也重新生成")
+    parser.add_argument("--encoding", action="append", default=[], metavar="PATTERN=ENC",
+                        help="为后缀（如 .sql=latin-1）或相对项目目录的子目录（如 legacy=big5）指定优先尝试的编码（可多次指定）")
+    parser.add_argument("--no-infer-encoding", action="store_true", help="不抽样推断项目编码，始终按 UTF-8、GBK 的顺序尝试")
+    parser.add_argument("--no-cache", action="store_true", help="不使用目录索引与内容缓存")
+    return parser
+
+
+def _normalize_ext(ext: str) -> str:
+    """统一后缀格式为小写且以点开头"""
+    ext = ext.strip().lower()
+    return ext if ext.startswith(".") else f".{ext}"
+
+
+_STAGE_NAMES = {"scan": "扫描", "read": "读取", "layout": "排版", "render": "渲染"}
+
+
+def _parse_encoding_overrides(specs: list[str]) -> dict[str, str]:
+    """解析 PATTERN=ENC 形式的编码指定，格式错误或编码未知时抛出 ValueError"""
+    import codecs
+
+    overrides = {}
+    for spec in specs:
+        pattern, sep, encoding = spec.rpartition("=")
+        if not sep or not pattern.strip() or not encoding.strip():
+            raise ValueError(f"编码指定格式应为 PATTERN=ENC：{spec}")
+        try:
+            codecs.lookup(encoding.strip())
+        except LookupError:
+            raise ValueError(f"未知编码：{encoding}") from None
+        overrides[pattern.strip()] = encoding.strip()
+    return overrides
+
+
+def _print_progress(event) -> None:
+    """只输出各阶段结束时的汇总信息"""
+    if not event.finished:
+        return
+    line = f"{_STAGE_NAMES.get(event.stage, event.stage)}完成：{event.done}"
+    if event.stage == "render":
+        line += " 页"
+    else:
+        line += " 个文件"
+    if event.bytes:
+        line += f"，{event.bytes / 1024 / 1024:.1f} MB"
+    print(f"{line}，耗时 {event.elapsed:.2f} 秒")
+
+
+def main(argv=None) -> int:
+    """命令行主流程：扫描 → 读取 → 排版并生成 PDF"""
+    args = _build_parser().parse_args(argv)
+    if not os.path.isdir(args.project_dir):
+        print(f"错误：项目目录不存在：{args.project_dir}", file=sys.stderr)
+        return 2
+    if args.streaming and args.render_processes > 1:
+        print("错误：--render-processes 不能与 --streaming 同时使用", file=sys.stderr)
+        return 2
+    if args.estimate_pages and (args.full or args.streaming or args.render_processes > 1):
+        print("错误：--estimate-pages 不能与 --full、--streaming 或 --render-processes 同时使用", file=sys.stderr)
+        return 2
+    try:
+        encoding_overrides = _parse_encoding_overrides(args.encoding)
+    except ValueError as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return 2
+
+    start_time = time.perf_counter()
+    from .pipeline import DocPipeline, PipelineError
+
+    pipeline = DocPipeline(
+        args.project_dir, args.output, args.name, args.version,
+        custom_excluded_dirs=args.exclude_dir,
+        custom_excluded_exts=[_normalize_ext(e) for e in args.exclude_ext],
+        remove_comments=args.strip_comments,
+        read_processes=args.processes,
+        use_cache=not args.no_cache,
+        streaming=args.streaming,
+        backend=args.backend,
+        full_export=args.full,
+        save_page_index=args.page_index,
+        render_processes=args.render_processes,
+        layout_processes=args.layout_processes,
+        estimate_pages=args.estimate_pages,
+        force=args.force,
+        encoding_overrides=encoding_overrides,
+        infer_encoding=not args.no_infer_encoding,
+        progress_callback=_print_progress,
+    )
+    print(f"启动耗时：{(time.perf_counter() - start_time) * 1000:.0f} ms")
+
+    try:
+        result = pipeline.run()
+    except PipelineError as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return 1
+
+    if result.counters.get("build_skipped"):
+        print("输入与参数均未变化，跳过生成（使用 --force 强制重新生成）")
+    if result.encodings:
+        print(f"解码顺序：{' → '.join(result.encodings)}")
+    for key, value in result.counters.items():
+        print(f"  {key}: {value}")
+    approx = "约 " if result.pages_estimated else ""
+    print(f"共 {approx}{result.total_pages} 页，输出 {result.generated_pages} 页，有效 {result.non_empty_files} 个文件，{result.total_lines} 行")
+    print(f"文件保存至：{args.output}")
+    print(f"总耗时：{time.perf_counter() - start_time:.2f} 秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
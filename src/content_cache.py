@@ -0,0 +1,111 @@
+import os
+import pathlib
+import hashlib
+import zlib
+import threading
+from typing import Optional
+
+
+class ContentCache:
+    """已解码、已去注释文本的本地缓存，按 (路径, 大小, mtime, 编码策略, 去注释标志) 寻址"""
+
+    # 缓存格式版本，格式或处理逻辑变化时递增以使旧缓存失效
+    VERSION = 3
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES, encoding_policy: str = "auto"):
+        """初始化缓存目录与容量上限"""
+        self.cache_dir = cache_dir or self.default_cache_dir()
+        self.max_bytes = max_bytes
+        self.encoding_policy = encoding_policy
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def default_cache_dir() -> str:
+        """默认缓存目录（与 settings.db 同级的 data 目录下）"""
+        base = pathlib.Path(__file__).resolve().parent.parent
+        return os.path.join(base, "data", "content_cache")
+
+    def key_for(self, file_path: pathlib.Path, strip_comments: bool, st: Optional[os.stat_result] = None) -> Optional[str]:
+        """根据文件元数据与处理参数计算缓存键，文件不可访问时返回 None"""
+        if st is None:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                return None
+        raw = f"{self.VERSION}|{os.path.abspath(file_path)}|{st.st_size}|{st.st_mtime_ns}|{self.encoding_policy}|{int(strip_comments)}"
+        return hashlib.sha1(raw.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        """缓存条目文件路径（两级目录，避免单目录文件过多）"""
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key: str) -> Optional[tuple[str, int]]:
+        """读取缓存的 (文本, 行数)，未命中返回 None"""
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                header = f.readline()
+                payload = f.read()
+            content = zlib.decompress(payload).decode("utf-8", errors="surrogatepass")
+            line_count = int(header)
+            # 更新访问时间，作为 LRU 淘汰依据
+            os.utime(path)
+        except (OSError, ValueError, zlib.error):
+            return None
+        return content, line_count
+
+    def put(self, key: str, content: str, line_count: int) -> None:
+        """写入缓存条目（先写临时文件再原子替换）"""
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            payload = zlib.compress(content.encode("utf-8", errors="surrogatepass"), 1)
+            with open(tmp_path, "wb") as f:
+                f.write(f"{line_count}\n".encode("ascii"))
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"写入内容缓存失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def prune(self) -> int:
+        """按最近使用时间淘汰条目，使缓存目录总大小不超过上限，返回删除的条目数"""
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.cache_dir) as buckets:
+                for bucket in buckets:
+                    if not bucket.is_dir(follow_symlinks=False):
+                        continue
+                    with os.scandir(bucket.path) as it:
+                        for entry in it:
+                            try:
+                                st = entry.stat(follow_symlinks=False)
+                            except OSError:
+                                continue
+                            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                            total += st.st_size
+        except OSError as e:
+            print(f"清理内容缓存失败: {e}")
+            return 0
+
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                continue
+        return removed
@@ -0,0 +1,128 @@
+import os
+import codecs
+import pathlib
+from collections import Counter
+from typing import Iterable, Optional
+
+from .scanner import Scanner, chardet
+
+
+class EncodingPolicy:
+    """项目级编码策略：抽样推断项目的主要编码并优先尝试，支持按目录或后缀指定编码
+
+    推断结果是一条解码顺序，严格 UTF-8 始终在最前，推断只调整其后的回退顺序，例如 Big5 项目为 (utf-8, big5, gbk)。
+    合法的 UTF-8 文本几乎不会是其他编码，对 GBK 等字节也会在第一个非法字节处很快失败；
+    反过来 GBK、GB18030 能无报错地解码许多 UTF-8 字节序列，排在前面会把未抽样到的 UTF-8 文件解码成乱码。
+    指定的编码（目录按最长前缀匹配，优先于后缀）排在该文件解码顺序的最前面，解码失败时仍按推断顺序回退。
+    """
+
+    # 参与推断的抽样文件数与每个文件读取的字节数
+    SAMPLE_FILES = 64
+    SAMPLE_BYTES = 32768
+    # 编码在含非 ASCII 字符的样本中占比不低于该值时列为主要编码
+    MIN_SHARE = 0.2
+    # chardet 检测结果到实际使用编码的映射（用超集解码，避免生僻字失败）
+    # GB18030 统一按 GBK 处理（GBK 失败时仍由 chardet 兜底）
+    _SUPERSETS = {"gb2312": "gbk", "gb18030": "gbk", "ascii": "utf-8"}
+
+    def __init__(self, root_dir: str, overrides: Optional[dict[str, str]] = None):
+        """初始化默认解码顺序并解析指定编码：以 . 开头的键为文件后缀，其余为相对项目目录的子目录"""
+        self.root_dir = os.path.abspath(root_dir)
+        self.encodings: tuple[str, ...] = Scanner.DEFAULT_ENCODINGS
+        self.sampled = 0
+        self._ext_overrides: dict[str, str] = {}
+        self._dir_overrides: list[tuple[str, str]] = []
+        for pattern, encoding in (overrides or {}).items():
+            try:
+                encoding = codecs.lookup(encoding).name
+            except LookupError:
+                print(f"忽略未知编码 {encoding}（{pattern}）")
+                continue
+            pattern = pattern.strip()
+            if pattern.startswith("*."):
+                pattern = pattern[1:]
+            if pattern.startswith(".") and "/" not in pattern and os.sep not in pattern:
+                self._ext_overrides[pattern.lower()] = encoding
+            else:
+                prefix = os.path.join(self.root_dir, os.path.normpath(pattern))
+                self._dir_overrides.append((prefix.rstrip(os.sep) + os.sep, encoding))
+        self._dir_overrides.sort(key=lambda item: len(item[0]), reverse=True)
+
+    @staticmethod
+    def _normalize(encoding: Optional[str]) -> Optional[str]:
+        """统一编码名称，未知编码与非 ASCII 兼容的编码（如 UTF-16）返回 None"""
+        if not encoding:
+            return None
+        try:
+            name = codecs.lookup(encoding).name
+        except LookupError:
+            return None
+        name = EncodingPolicy._SUPERSETS.get(name, name)
+        try:
+            if "abc\n".encode(name) != b"abc\n":
+                return None
+        except (UnicodeError, LookupError):
+            return None
+        return name
+
+    @classmethod
+    def detect_sample(cls, sample: bytes) -> Optional[str]:
+        """判断样本的编码：纯 ASCII 不提供信息返回 None，合法 UTF-8 优先，否则使用 chardet 的结果"""
+        if not sample or sample.isascii():
+            return None
+        if sample.startswith(codecs.BOM_UTF8):
+            return "utf-8"
+        try:
+            # 样本末尾可能截断多字节字符，不作为最终块解码
+            codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+            return "utf-8"
+        except UnicodeDecodeError:
+            pass
+        encoding = cls._normalize(chardet.detect(sample).get("encoding"))
+        if encoding is None:
+            return None
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        except UnicodeDecodeError:
+            return None
+        return encoding
+
+    def infer(self, paths: Iterable[pathlib.Path]) -> tuple[str, ...]:
+        """从文件列表中均匀抽样推断主要编码，更新并返回默认解码顺序（UTF-8 之后按样本数排列主要编码）"""
+        paths = list(paths)
+        step = max(1, len(paths) // self.SAMPLE_FILES)
+        counter: Counter = Counter()
+        self.sampled = 0
+        for path in paths[::step][:self.SAMPLE_FILES]:
+            try:
+                with open(path, "rb") as f:
+                    sample = f.read(self.SAMPLE_BYTES)
+            except OSError:
+                continue
+            self.sampled += 1
+            encoding = self.detect_sample(sample)
+            if encoding is not None:
+                counter[encoding] += 1
+
+        total = sum(counter.values())
+        dominant = [enc for enc, n in counter.most_common() if n >= total * self.MIN_SHARE and enc != "utf-8"]
+        self.encodings = tuple(dict.fromkeys(["utf-8"] + dominant + list(Scanner.DEFAULT_ENCODINGS)))
+        return self.encodings
+
+    def candidates(self, file_path: pathlib.Path) -> tuple[str, ...]:
+        """文件的解码顺序：指定编码（若有）在前，其后为项目的默认解码顺序"""
+        if self._dir_overrides:
+            path = os.path.abspath(file_path)
+            for prefix, encoding in self._dir_overrides:
+                if path.startswith(prefix):
+                    return tuple(dict.fromkeys((encoding,) + self.encodings))
+        encoding = self._ext_overrides.get(pathlib.PurePath(file_path).suffix.lower())
+        if encoding is not None:
+            return tuple(dict.fromkeys((encoding,) + self.encodings))
+        return self.encodings
+
+    def key(self) -> str:
+        """策略摘要，作为内容缓存键的一部分：解码顺序或指定编码变化时重新解码"""
+        overrides = sorted(self._ext_overrides.items()) + sorted(self._dir_overrides)
+        return ",".join(self.encodings) + "|" + ";".join(f"{p}={e}" for p, e in overrides)
+
@@ -0,0 +1,130 @@
+import os
+import pathlib
+import hashlib
+import pickle
+import threading
+from typing import Optional
+from weakref import WeakKeyDictionary
+
+import reportlab
+from reportlab.pdfbase.ttfonts import TTFont, TTFontFace
+
+
+class _PdfScale:
+    """可序列化的字形单位缩放函数（替代 reportlab 解析时生成的 lambda）"""
+
+    def __init__(self, units_per_em: int):
+        self.mult = None if units_per_em == 1000 else 1000 / units_per_em
+
+    def __call__(self, x):
+        return x if self.mult is None else x * self.mult
+
+
+class FontCache:
+    """已解析字体与字形宽度表的本地缓存，按 (字体路径, 子字体索引, 大小, mtime) 寻址
+
+    TTC/TTF 解析结果（度量、字符映射等）以 pickle 保存，字体文件原始字节不入缓存，
+    加载时直接从字体文件读取；宽度表按字号单独保存，便于排版过程中增量更新。
+    """
+
+    # 缓存格式版本，格式或处理逻辑变化时递增以使旧缓存失效
+    VERSION = 1
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        """初始化缓存目录"""
+        self.cache_dir = cache_dir or self.default_cache_dir()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def default_cache_dir() -> str:
+        """默认缓存目录（与 settings.db 同级的 data 目录下）"""
+        base = pathlib.Path(__file__).resolve().parent.parent
+        return os.path.join(base, "data", "font_cache")
+
+    def key_for(self, font_path: Optional[str], subfont_index: int = 0) -> Optional[str]:
+        """根据字体文件元数据计算缓存键；内置字体（无路径）按 reportlab 版本寻址，文件不可访问时返回 None"""
+        if font_path is None:
+            raw = f"{self.VERSION}|builtin|{reportlab.Version}"
+        else:
+            try:
+                st = os.stat(font_path)
+            except OSError:
+                return None
+            raw = f"{self.VERSION}|{reportlab.Version}|{os.path.abspath(font_path)}|{subfont_index}|{st.st_size}|{st.st_mtime_ns}"
+        return hashlib.sha1(raw.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        """先写临时文件再原子替换"""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"写入字体缓存失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def load_ttfont(self, name: str, font_path: str, subfont_index: int = 0) -> TTFont:
+        """加载 TrueType 字体：命中缓存时跳过解析，否则解析后写入缓存"""
+        key = self.key_for(font_path, subfont_index)
+        entry_path = os.path.join(self.cache_dir, f"{key}.font") if key else None
+
+        if entry_path and os.path.exists(entry_path):
+            try:
+                font = self._restore_ttfont(name, font_path, entry_path)
+                if font is not None:
+                    return font
+            except Exception as e:
+                print(f"读取字体缓存失败，重新解析: {e}")
+
+        font = TTFont(name, font_path, subfontIndex=subfont_index)
+        if entry_path:
+            self._store_ttfont(font, entry_path)
+        return font
+
+    def _store_ttfont(self, font: TTFont, entry_path: str) -> None:
+        """序列化解析结果（不含字体文件原始字节与运行期状态）"""
+        face_state = {k: v for k, v in vars(font.face).items() if k not in ("_ttf_data", "_pdfScale")}
+        font_state = {k: v for k, v in vars(font).items() if k not in ("face", "state", "fontName")}
+        try:
+            data = pickle.dumps({"face": face_state, "font": font_state}, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"字体缓存序列化失败: {e}")
+            return
+        self._write_atomic(entry_path, data)
+
+    def _restore_ttfont(self, name: str, font_path: str, entry_path: str) -> Optional[TTFont]:
+        """从缓存重建 TTFont 对象，缓存内容不完整时返回 None"""
+        with open(entry_path, "rb") as f:
+            state = pickle.load(f)
+        face_state, font_state = state["face"], state["font"]
+        if "unitsPerEm" not in face_state:
+            return None
+
+        face = TTFontFace.__new__(TTFontFace)
+        face.__dict__.update(face_state)
+        # 子集化嵌入时仍需要原始字节，直接读取文件比重新解析快得多
+        with open(font_path, "rb") as f:
+            face._ttf_data = f.read()
+        face._pdfScale = _PdfScale(face.unitsPerEm)
+
+        font = TTFont.__new__(TTFont)
+        font.__dict__.update(font_state)
+        font.fontName = name
+        font.face = face
+        font.state = WeakKeyDictionary()
+        return font
+
+    def width_table_path(self, font_name: str, font_path: Optional[str], font_size: float, subfont_index: int = 0) -> Optional[str]:
+        """字形宽度表缓存文件路径，无法确定字体版本时返回 None"""
+        key = self.key_for(font_path, subfont_index)
+        if key is None:
+            return None
+        return os.path.join(self.cache_dir, f"{key}.{font_name}.{font_size:g}.widths")
+
+    def write_bytes(self, path: str, data: bytes) -> None:
+        """写入任意缓存文件（原子替换）"""
+        self._write_atomic(path, data)
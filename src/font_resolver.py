@@ -0,0 +1,325 @@
+import os
+import sys
+import json
+import struct
+import pathlib
+import threading
+from typing import Optional
+
+
+def _default_font_dirs() -> list[str]:
+    """当前平台的标准字体目录"""
+    home = os.path.expanduser("~")
+    if sys.platform.startswith("win"):
+        windir = os.environ.get("WINDIR", r"C:\Windows")
+        return [
+            os.path.join(windir, "Fonts"),
+            os.path.join(os.environ.get("LOCALAPPDATA", ""), "Microsoft", "Windows", "Fonts"),
+        ]
+    if sys.platform == "darwin":
+        return ["/System/Library/Fonts", "/Library/Fonts", os.path.join(home, "Library", "Fonts")]
+    dirs = ["/usr/share/fonts", "/usr/local/share/fonts", os.path.join(home, ".local", "share", "fonts"), os.path.join(home, ".fonts")]
+    data_home = os.environ.get("XDG_DATA_HOME")
+    if data_home:
+        dirs.append(os.path.join(data_home, "fonts"))
+    return dirs
+
+
+class FontInfo:
+    """字体文件中单个字体（TTC 子字体）的索引信息"""
+
+    __slots__ = ("families", "style", "path", "subfont_index", "truetype", "cjk")
+
+    def __init__(self, families: list[str], style: str, path: str, subfont_index: int, truetype: bool, cjk: bool):
+        self.families = families            # 全部族名（含本地化名称，如“文泉驿正黑”）
+        self.style = style                  # 子族名，如 Regular、Bold
+        self.path = path
+        self.subfont_index = subfont_index
+        self.truetype = truetype            # 是否为 TrueType 轮廓（reportlab 不支持 CFF/PostScript 轮廓）
+        self.cjk = cjk                      # 字符映射表是否包含常用汉字
+
+    @property
+    def regular(self) -> bool:
+        """是否为常规字重（同族多个文件时优先使用）"""
+        return self.style.casefold() in ("regular", "book", "normal", "roman", "")
+
+    def to_json(self) -> list:
+        return [self.families, self.style, self.path, self.subfont_index, self.truetype, self.cjk]
+
+    @classmethod
+    def from_json(cls, data: list) -> "FontInfo":
+        return cls(*data)
+
+
+class _SfntReader:
+    """只读取表目录、name 表与 cmap 表的最小 sfnt 解析器，不加载字形数据"""
+
+    # 用于判断是否覆盖中文的探测字符：中、文、国
+    CJK_PROBES = (0x4E2D, 0x6587, 0x56FD)
+
+    def __init__(self, f):
+        self.f = f
+
+    def _read(self, offset: int, size: int) -> bytes:
+        self.f.seek(offset)
+        data = self.f.read(size)
+        if len(data) != size:
+            raise ValueError("字体文件被截断")
+        return data
+
+    def face_offsets(self) -> list[int]:
+        """返回各子字体的偏移（普通 TTF/OTF 只有一个）"""
+        tag = self._read(0, 4)
+        if tag == b"ttcf":
+            num_fonts = struct.unpack(">I", self._read(8, 4))[0]
+            return list(struct.unpack(f">{num_fonts}I", self._read(12, 4 * num_fonts)))
+        if tag in (b"\x00\x01\x00\x00", b"true", b"OTTO"):
+            return [0]
+        raise ValueError("不是 TrueType/OpenType 字体")
+
+    def tables(self, face_offset: int) -> dict[bytes, tuple[int, int]]:
+        """读取表目录：{标签: (偏移, 长度)}"""
+        num_tables = struct.unpack(">H", self._read(face_offset + 4, 2))[0]
+        directory = self._read(face_offset + 12, 16 * num_tables)
+        result = {}
+        for i in range(num_tables):
+            tag, _, offset, length = struct.unpack_from(">4sIII", directory, 16 * i)
+            result[tag] = (offset, length)
+        return result
+
+    def family_names(self, name_table: tuple[int, int]) -> tuple[list[str], str]:
+        """读取 name 表中的族名（nameID 1 与 16，英文名在前）与英文子族名（nameID 2）"""
+        offset, length = name_table
+        data = self._read(offset, length)
+        _, count, string_offset = struct.unpack_from(">HHH", data, 0)
+        names = []
+        style = ""
+        for i in range(count):
+            platform_id, encoding_id, language_id, name_id, n_len, n_off = struct.unpack_from(">HHHHHH", data, 6 + 12 * i)
+            if name_id not in (1, 2, 16):
+                continue
+            raw = data[string_offset + n_off:string_offset + n_off + n_len]
+            if platform_id in (0, 3):
+                name = raw.decode("utf-16-be", errors="ignore")
+            elif platform_id == 1 and encoding_id == 0:
+                name = raw.decode("latin-1")
+            else:
+                continue
+            name = name.strip("\x00 ").strip()
+            if not name:
+                continue
+            english = platform_id == 1 or language_id == 0x409
+            if name_id == 2:
+                if english and not style:
+                    style = name
+                continue
+            names.append((not english, name_id != 1, name))
+        names.sort()
+        result = []
+        for _, _, name in names:
+            if name not in result:
+                result.append(name)
+        return result, style
+
+    def covers(self, cmap_table: tuple[int, int], codepoints) -> bool:
+        """判断 Unicode cmap 子表是否映射全部给定码位"""
+        offset, _ = cmap_table
+        _, num_subtables = struct.unpack(">HH", self._read(offset, 4))
+        records = self._read(offset + 4, 8 * num_subtables)
+        subtables = {}
+        for i in range(num_subtables):
+            platform_id, encoding_id, sub_offset = struct.unpack_from(">HHI", records, 8 * i)
+            subtables[(platform_id, encoding_id)] = offset + sub_offset
+
+        for key in ((3, 10), (0, 4), (0, 6), (3, 1), (0, 3), (0, 1), (0, 0)):
+            if key not in subtables:
+                continue
+            sub_offset = subtables[key]
+            fmt = struct.unpack(">H", self._read(sub_offset, 2))[0]
+            if fmt == 12:
+                return all(self._lookup_format12(sub_offset, cp) for cp in codepoints)
+            if fmt == 4:
+                return all(self._lookup_format4(sub_offset, cp) for cp in codepoints)
+        return False
+
+    def _lookup_format4(self, sub_offset: int, codepoint: int) -> bool:
+        """在 format 4 子表中查找码位是否映射到非零字形"""
+        length = struct.unpack(">H", self._read(sub_offset + 2, 2))[0]
+        data = self._read(sub_offset, length)
+        seg_count = struct.unpack_from(">H", data, 6)[0] // 2
+        ends = struct.unpack_from(f">{seg_count}H", data, 14)
+        starts_at = 16 + 2 * seg_count
+        starts = struct.unpack_from(f">{seg_count}H", data, starts_at)
+        deltas = struct.unpack_from(f">{seg_count}h", data, starts_at + 2 * seg_count)
+        range_at = starts_at + 4 * seg_count
+        range_offsets = struct.unpack_from(f">{seg_count}H", data, range_at)
+        for i in range(seg_count):
+            if ends[i] < codepoint:
+                continue
+            if starts[i] > codepoint:
+                return False
+            if range_offsets[i] == 0:
+                return (codepoint + deltas[i]) & 0xFFFF != 0
+            glyph_at = range_at + 2 * i + range_offsets[i] + 2 * (codepoint - starts[i])
+            glyph = struct.unpack_from(">H", data, glyph_at)[0]
+            return glyph != 0
+        return False
+
+    def _lookup_format12(self, sub_offset: int, codepoint: int) -> bool:
+        """在 format 12 子表中查找码位"""
+        n_groups = struct.unpack(">I", self._read(sub_offset + 12, 4))[0]
+        data = self._read(sub_offset + 16, 12 * n_groups)
+        for i in range(n_groups):
+            start, end, _ = struct.unpack_from(">III", data, 12 * i)
+            if start <= codepoint <= end:
+                return True
+        return False
+
+
+class FontResolver:
+    """扫描系统字体目录一次并持久化 族名 → (文件, 子字体) 索引，后续启动直接查表"""
+
+    # 索引格式版本，格式或探测逻辑变化时递增以使旧索引失效
+    VERSION = 2
+    FONT_EXTS = (".ttf", ".ttc", ".otf", ".otc")
+
+    # 中文字体优先级：Windows 常见字体，其次为 Linux 发行版常见的 CJK 字体
+    CJK_PREFERENCE = (
+        "SimSun", "NSimSun", "Microsoft YaHei", "SimHei",
+        "Noto Sans Mono CJK SC", "Noto Sans CJK SC", "Noto Serif CJK SC",
+        "Source Han Sans SC", "Source Han Serif SC",
+        "WenQuanYi Zen Hei Mono", "WenQuanYi Zen Hei", "WenQuanYi Micro Hei Mono", "WenQuanYi Micro Hei",
+        "AR PL UMing CN", "AR PL UKai CN", "AR PL SungtiL GB",
+        "Droid Sans Fallback", "Unifont",
+    )
+
+    _lock = threading.Lock()
+
+    def __init__(self, index_path: Optional[str] = None, font_dirs: Optional[list[str]] = None):
+        """初始化解析器，已有索引且字体目录未变化时不扫描"""
+        self.index_path = index_path or self.default_index_path()
+        self.font_dirs = font_dirs if font_dirs is not None else _default_font_dirs()
+        self._fonts: list[FontInfo] = []
+        self._by_family: dict[str, FontInfo] = {}
+        self.scanned = False
+
+    @staticmethod
+    def default_index_path() -> str:
+        """默认索引文件路径（与 settings.db 同目录）"""
+        base = pathlib.Path(__file__).resolve().parent.parent
+        return os.path.join(base, "data", "font_index.json")
+
+    @staticmethod
+    def _stamp(path: str) -> int:
+        """目录的 mtime，不存在时返回 -1"""
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return -1
+
+    def _is_fresh(self, data: dict) -> bool:
+        """索引记录的字体根目录与当前一致，且扫描过的每个目录 mtime 都未变化
+
+        字体包通常安装到根目录下新建的子目录中，只改变中间目录的 mtime，因此需要逐个目录比对（只 stat，不遍历）。
+        """
+        if data.get("version") != self.VERSION or data.get("roots") != list(self.font_dirs):
+            return False
+        return all(self._stamp(d) == stamp for d, stamp in data["dirs"].items())
+
+    def _ensure_index(self) -> None:
+        """加载磁盘索引，不存在或已过期时重新扫描"""
+        if self._fonts or self.scanned:
+            return
+        with self._lock:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if self._is_fresh(data):
+                    self._set_fonts([FontInfo.from_json(item) for item in data["fonts"]])
+                    return
+            except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                pass
+            self._rescan()
+
+    def _set_fonts(self, fonts: list[FontInfo]) -> None:
+        """建立族名查找表（常规字重优先，其余按扫描顺序）"""
+        self._fonts = fonts
+        self._by_family = {}
+        for info in sorted(fonts, key=lambda info: not info.regular):
+            for family in info.families:
+                self._by_family.setdefault(family.casefold(), info)
+
+    def _rescan(self) -> None:
+        """遍历字体目录重建索引并写入磁盘，同时记录扫描过的每个目录的 mtime"""
+        fonts = []
+        stamps: dict[str, int] = {}
+        for root in self.font_dirs:
+            # 先记录 mtime 再遍历，遍历期间的改动会在下次启动时被发现
+            stamps[root] = self._stamp(root)
+            if not os.path.isdir(root):
+                continue
+            for dir_path, dir_names, file_names in os.walk(root):
+                dir_names.sort()
+                for name in dir_names:
+                    sub_dir = os.path.join(dir_path, name)
+                    stamps[sub_dir] = self._stamp(sub_dir)
+                for name in sorted(file_names):
+                    if name.lower().endswith(self.FONT_EXTS):
+                        fonts.extend(self._probe_file(os.path.join(dir_path, name)))
+        self._set_fonts(fonts)
+        self.scanned = True
+
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": self.VERSION, "roots": list(self.font_dirs), "dirs": stamps,
+                           "fonts": [info.to_json() for info in fonts]}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"写入字体索引失败: {e}")
+
+    @staticmethod
+    def _probe_file(path: str) -> list[FontInfo]:
+        """读取字体文件的族名、轮廓类型与中文覆盖情况，无法解析时返回空列表"""
+        result = []
+        try:
+            with open(path, "rb") as f:
+                reader = _SfntReader(f)
+                for index, face_offset in enumerate(reader.face_offsets()):
+                    tables = reader.tables(face_offset)
+                    if b"name" not in tables:
+                        continue
+                    families, style = reader.family_names(tables[b"name"])
+                    if not families:
+                        continue
+                    cjk = b"cmap" in tables and reader.covers(tables[b"cmap"], _SfntReader.CJK_PROBES)
+                    result.append(FontInfo(families, style, path, index, b"glyf" in tables, cjk))
+        except (OSError, ValueError, struct.error):
+            return []
+        return result
+
+    def find(self, family: str) -> Optional[FontInfo]:
+        """按族名（不区分大小写）查找可被 reportlab 使用的 TrueType 字体"""
+        self._ensure_index()
+        key = family.casefold()
+        info = self._by_family.get(key)
+        # 索引中的字体文件已被删除时重新扫描一次
+        if info is not None and not os.path.exists(info.path) and not self.scanned:
+            self._rescan()
+            info = self._by_family.get(key)
+        if info is None or not info.truetype or not os.path.exists(info.path):
+            return None
+        return info
+
+    def resolve_cjk(self) -> Optional[tuple[str, FontInfo]]:
+        """解析一个可显示中文的字体，返回 (注册名, 字体信息)；按优先级查找，其次取任意覆盖中文的字体"""
+        self._ensure_index()
+        for family in self.CJK_PREFERENCE:
+            info = self.find(family)
+            if info is not None and info.cjk:
+                return family, info
+        for info in sorted(self._fonts, key=lambda info: not info.regular):
+            if info.truetype and info.cjk and os.path.exists(info.path):
+                return info.families[0], info
+        return None
@@ -0,0 +1,172 @@
+import pickle
+import sys
+import zlib
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Optional
+
+from reportlab.pdfbase import pdfmetrics
+
+# 优先使用 NumPy 进行向量化宽度查表与前缀和，未安装时回退到纯 Python 实现
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 宽度单位：1/1000 磅。使用整数可保证任意分段、批量或逐行求和结果完全一致，
+# 从而让“只计数”与“实际换行”两遍排版得到相同的断点。
+WIDTH_SCALE = 1000
+BMP_SIZE = 0x10000
+
+
+class GlyphWidthTable:
+    """按码位索引的字形宽度表（BMP 范围），用于快速计算换行断点"""
+
+    def __init__(self, font_name: str, font_size: float):
+        """初始化空宽度表，各字符宽度在首次用到时测量"""
+        self.font_name = font_name
+        self.font_size = font_size
+        if np is not None:
+            self._table = np.full(BMP_SIZE, -1, dtype=np.int64)
+        else:
+            self._table = [-1] * BMP_SIZE
+        self._astral: dict[int, int] = {}
+        # 自上次加载/保存以来是否有新测量的宽度
+        self.dirty = False
+
+    def _measure(self, codepoint: int) -> int:
+        """测量单个字符宽度（整数单位）"""
+        self.dirty = True
+        return round(pdfmetrics.stringWidth(chr(codepoint), self.font_name, self.font_size) * WIDTH_SCALE)
+
+    def dumps(self) -> bytes:
+        """序列化已测量的宽度（未测量项为 -1，压缩后体积很小）"""
+        table = array('q', self._table.tolist() if np is not None else self._table)
+        if sys.byteorder != 'little':
+            table.byteswap()
+        return pickle.dumps({
+            "scale": WIDTH_SCALE,
+            "font": (self.font_name, self.font_size),
+            "table": zlib.compress(table.tobytes(), 6),
+            "astral": self._astral,
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes) -> bool:
+        """从 dumps 的结果恢复宽度表，格式或字体不匹配时返回 False 且不修改当前表"""
+        try:
+            state = pickle.loads(data)
+            if state["scale"] != WIDTH_SCALE or state["font"] != (self.font_name, self.font_size):
+                return False
+            table = array('q')
+            table.frombytes(zlib.decompress(state["table"]))
+            if len(table) != BMP_SIZE:
+                return False
+            if sys.byteorder != 'little':
+                table.byteswap()
+            astral = dict(state["astral"])
+        except Exception:
+            return False
+        self._table = np.frombuffer(table, dtype=np.int64).copy() if np is not None else table.tolist()
+        self._astral = astral
+        self.dirty = False
+        return True
+
+    def width_of(self, codepoint: int) -> int:
+        """查询单个码位的宽度，未缓存时测量并写入表"""
+        if codepoint >= BMP_SIZE:
+            w = self._astral.get(codepoint)
+            if w is None:
+                w = self._astral[codepoint] = self._measure(codepoint)
+            return w
+        w = int(self._table[codepoint])
+        if w < 0:
+            w = self._measure(codepoint)
+            self._table[codepoint] = w
+        return w
+
+    def _widths_py(self, line: str) -> list[int]:
+        """纯 Python 查表，返回每个字符的宽度"""
+        table = self._table
+        width_of = self.width_of
+        widths = []
+        for c in map(ord, line):
+            w = table[c] if c < BMP_SIZE else -1
+            widths.append(w if w >= 0 else width_of(c))
+        return widths
+
+    def _widths_np(self, codepoints):
+        """NumPy 批量查表，缺失的宽度按唯一码位补测"""
+        widths = self._table[codepoints]
+        missing = widths < 0
+        if missing.any():
+            for c in np.unique(codepoints[missing]).tolist():
+                self._table[c] = self._measure(c)
+            widths = self._table[codepoints]
+        return widths
+
+    @staticmethod
+    def _segments(cum, start: int, end: int, limit: int) -> list[int]:
+        """在前缀和 cum 上对 [start, end) 贪心分段，返回各段相对 start 的结束下标"""
+        breaks = []
+        s = start
+        while s < end:
+            e = bisect_right(cum, cum[s] + limit, s + 1, end + 1) - 1
+            if e <= s:
+                e = s + 1  # 单个字符超宽时也至少放一个
+            breaks.append(e - start)
+            s = e
+        return breaks
+
+    def break_points(self, line: str, limit: int) -> Optional[list[int]]:
+        """计算单行换行断点：无需换行返回 None，否则返回每段结束下标"""
+        return self.batch_break_points([line], limit)[0]
+
+    def batch_break_points(self, lines: list[str], limit: int) -> list[Optional[list[int]]]:
+        """批量计算多行的换行断点，一次完成查表与前缀和"""
+        if not lines:
+            return []
+
+        codepoints = None
+        # 超出 BMP 的字符（如 emoji）不在向量表中，整批回退到逐行查表
+        if np is not None and not any(not line.isascii() and max(line) > '\uffff' for line in lines):
+            try:
+                codepoints = np.frombuffer("".join(lines).encode("utf-32-le"), dtype=np.uint32)
+            except UnicodeEncodeError:
+                codepoints = None
+
+        if codepoints is None:
+            results = []
+            for line in lines:
+                widths = self._widths_py(line)
+                if sum(widths) <= limit:
+                    results.append(None)
+                    continue
+                cum = list(accumulate(widths, initial=0))
+                results.append(self._segments(cum, 0, len(line), limit))
+            return results
+
+        cum = np.zeros(len(codepoints) + 1, dtype=np.int64)
+        np.cumsum(self._widths_np(codepoints), out=cum[1:])
+
+        lengths = np.fromiter((len(line) for line in lines), dtype=np.int64, count=len(lines))
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        fits = ((cum[ends] - cum[starts]) <= limit).tolist()
+
+        results = []
+        for fit, start, end in zip(fits, starts.tolist(), ends.tolist()):
+            if fit:
+                results.append(None)
+                continue
+            # 在该行的前缀和上二分定位每段的结束位置
+            breaks = []
+            s = start
+            while s < end:
+                e = s + int(np.searchsorted(cum[s + 1:end + 1], cum[s] + limit, side="right"))
+                if e <= s:
+                    e = s + 1
+                breaks.append(e - start)
+                s = e
+            results.append(breaks)
+        return results
@@ -11,10 +11,9 @@ import base64
 import ctypes
 from ctypes import wintypes
 import secrets
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import tkinter.font as tkfont
 from .scanner import Scanner
-from .pdf_generator import PDFGenerator
+from .pipeline import DocPipeline, CancelToken, PipelineCancelled, ProgressEvent
 from .ai_service import AIService
 
 
@@ -465,6 +464,16 @@ class MainApplication(tk.Tk):
                     self.ai_config[k] = v
         self.custom_excluded_dirs = []
         self.custom_excluded_exts = []
+        # 读取阶段的进程数：0 表示使用线程池（适合小项目），大于 0 时使用进程池
+        self.read_process_workers = 0
+        # 是否使用流式流水线（扫描、读取、排版、渲染并发执行，内存占用与输出规模相关）
+        self.streaming_pipeline = True
+        # PDF 输出后端："reportlab" 或 "direct"（精简写入器）
+        self.pdf_backend = "reportlab"
+        # 全量导出：输出全部页面而非前后各 30 页
+        self.full_export = False
+        # 估算模式：只完整读取可能落入前后各 30 页的文件，总页数为估算值（启用时不走流式流水线）
+        self.estimate_pages = False
 
         self._colors = {
             "bg": "#f6f8fa",
@@ -566,6 +575,10 @@ class MainApplication(tk.Tk):
         self.metric_output_pages_var = tk.StringVar(value="-")
         
         self.remove_comments_var = tk.BooleanVar(value=False)
+        # 忽略输出文件旁的构建清单，即使输入未变化也重新生成
+        self.force_var = tk.BooleanVar(value=False)
+        # 读取阶段的进程数（0 表示使用线程池）
+        self.read_processes_var = tk.StringVar(value=str(self.read_process_workers))
 
         # 构建各个卡片组件
         self._build_card_software(left)
@@ -711,6 +724,14 @@ class MainApplication(tk.Tk):
         cb = ttk.Checkbutton(card, text="生成时移除代码注释", variable=self.remove_comments_var)
         cb.grid(row=1, column=0, sticky="w")
 
+        cb = ttk.Checkbutton(card, text="强制重新生成（忽略构建清单）", variable=self.force_var)
+        cb.grid(row=2, column=0, sticky="w")
+
+        row = ttk.Frame(card, style="Card.TFrame")
+        row.grid(row=3, column=0, sticky="w", pady=(5, 0))
+        ttk.Label(row, text="读取进程数（0 为线程池）", style="CardLabel.TLabel").pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Spinbox(row, from_=0, to=os.cpu_count() or 4, width=5, textvariable=self.read_processes_var).pack(side=tk.LEFT)
+
     def _build_actions(self, parent: ttk.Frame):
         """构建操作按钮栏"""
         actions = ttk.Frame(parent, style="App.TFrame")
@@ -855,6 +876,7 @@ class MainApplication(tk.Tk):
         # 配置各个组件样式
         style.configure("App.TFrame", background=self._colors["bg"])
         style.configure("Top.TFrame", background=self._colors["bg"])
+        style.configure("Card.TFrame", background=self._colors["surface"])
 
         style.configure(
             "Card.TLabelframe",
@@ -1050,8 +1072,8 @@ class MainApplication(tk.Tk):
 
     def _stop_generation(self):
         """向生成线程发送停止信号"""
-        if hasattr(self, 'stop_event'):
-            self.stop_event.set()
+        if hasattr(self, 'cancel_token'):
+            self.cancel_token.cancel()
             self._set_status("正在停止任务…")
             self._log("正在停止任务…", level="key")
             self.stop_btn.state(["disabled"])
@@ -1081,149 +1103,118 @@ class MainApplication(tk.Tk):
         self._set_status("准备开始…")
         self._log("任务已启动", level="key")
         
-        self.stop_event = threading.Event()
+        self.cancel_token = CancelToken()
         
         # 汇总当前的排除项
         custom_dirs = list(self.custom_excluded_dirs)
         custom_exts = list(self.custom_excluded_exts)
         remove_comments = self.remove_comments_var.get()
+        force = self.force_var.get()
+        try:
+            self.read_process_workers = max(0, int(self.read_processes_var.get()))
+        except ValueError:
+            self.read_process_workers = 0
+        self.read_processes_var.set(str(self.read_process_workers))
         
         thread = threading.Thread(
             target=self._process_task,
-            args=(name, version, project_dir, output_path, custom_dirs, custom_exts, remove_comments),
+            args=(name, version, project_dir, output_path, custom_dirs, custom_exts, remove_comments, force),
             daemon=True
         )
         thread.start()
         
-    def _process_task(self, name, version, project_dir, output_path, custom_dirs=None, custom_exts=None, remove_comments=False):
+    def _process_task(self, name, version, project_dir, output_path, custom_dirs=None, custom_exts=None, remove_comments=False,
+                      force=False):
         """文档生成的核心工作流程（后台线程执行）"""
-        check_cancel = lambda: self.stop_event.is_set()
-        start_time = time.time()
-        
         try:
             self._set_progress(0)
             self._set_status("开始扫描文件…")
             self._log(f"开始扫描目录：{project_dir}", level="key")
             if custom_dirs or custom_exts:
                 self._log(f"使用自定义排除：{len(custom_dirs or [])} 个目录, {len(custom_exts or [])} 个后缀")
-            
-            def scan_callback(count, current_path):
-                if check_cancel():
-                    return
-                base = os.path.basename(str(current_path)) if current_path != "Done" else "完成"
-                msg = f"扫描中：已找到 {count} 个文件（{base}）"
-                self._set_status(msg)
-                self._set_progress(min(18, 6 + (count % 12)))
-            
-            scanner = Scanner(project_dir, custom_excluded_dirs=custom_dirs, custom_excluded_exts=custom_exts)
-            files = scanner.scan(check_cancel, scan_callback)
-            
-            if check_cancel():
-                raise Exception("任务已取消")
-            
-            scan_duration = time.time() - start_time
-            self._set_metric(self.metric_files_var, str(len(files)))
-            self._log(f"扫描完成：{len(files)} 个文件，耗时 {scan_duration:.2f} 秒", level="key")
-            
-            if not files:
-                raise Exception("未找到符合条件的代码文件！")
-            
-            self._set_status("正在读取文件内容…")
-            self._set_progress(25)
-            read_start_time = time.time()
-            total_lines = 0
-            non_empty_files = 0
-            results: list[tuple[str, str] | None] = [None] * len(files)
-
-            def worker(idx: int, path: pathlib.Path):
-                if check_cancel():
-                    return idx, path.name, "", 0, False
-
-                content = Scanner.read_file_content(path)
-                if remove_comments:
-                    content = Scanner.remove_code_comments(content, path.suffix)
-
-                if not content.strip():
-                    return idx, path.name, "", 0, False
-
-                return idx, path.name, content, len(content.splitlines()), True
-
-            # 使用多线程加速文件读取
-            max_workers = min(32, max(4, (os.cpu_count() or 4) * 2))
-            futures = []
-            completed = 0
-            last_name = ""
-
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                for i, f in enumerate(files):
-                    futures.append(executor.submit(worker, i, f))
-
-                for fut in as_completed(futures):
-                    if check_cancel():
-                        for f in futures:
-                            f.cancel()
-                        raise Exception("任务已取消")
-
-                    idx, file_name, content, lines, ok = fut.result()
-                    last_name = file_name
-                    completed += 1
-
-                    if ok:
-                        results[idx] = (file_name, content)
-                        total_lines += lines
-                        non_empty_files += 1
-
-                    if completed % 25 == 0 or completed == len(files):
-                        prog = 25 + (completed / max(1, len(files))) * 35
-                        self._set_status(f"读取中（{completed}/{len(files)}）：{last_name}")
-                        self._set_progress(prog)
-
-            file_contents = [r for r in results if r is not None]
-            results.clear()
-            del results
-            
-            read_duration = time.time() - read_start_time
-            self._set_metric(self.metric_non_empty_files_var, str(non_empty_files))
-            self._set_metric(self.metric_lines_var, str(total_lines))
-            self._log(f"读取完成：有效 {non_empty_files} 个文件，耗时 {read_duration:.2f} 秒", level="key")
-            
-            self._set_status("正在排版并生成 PDF…")
-            self._set_progress(70)
-            gen_start_time = time.time()
-            generator = PDFGenerator(output_path, name, version)
-            total_pages, generated_pages = generator.generate(file_contents, check_cancel)
-            
-            if check_cancel():
-                raise Exception("任务已取消")
-            
-            gen_duration = time.time() - gen_start_time
-            self._set_metric(self.metric_total_pages_var, str(total_pages))
+
+            pipeline = DocPipeline(
+                project_dir, output_path, name, version,
+                custom_excluded_dirs=custom_dirs, custom_excluded_exts=custom_exts,
+                remove_comments=remove_comments, read_processes=self.read_process_workers,
+                streaming=self.streaming_pipeline, backend=self.pdf_backend, full_export=self.full_export,
+                estimate_pages=self.estimate_pages, force=force,
+                progress_callback=self._on_pipeline_progress, cancel_token=self.cancel_token,
+            )
+            result = pipeline.run()
+
+            counters = result.counters
+            if counters.get("build_skipped"):
+                self._log("输入与参数均未变化，沿用已有的输出文件", level="key")
+            if "scan_index_hits" in counters:
+                self._log(f"目录索引：命中 {counters['scan_index_hits']} 个目录，重新扫描 {counters['scan_index_misses']} 个目录")
+            if "content_cache_hits" in counters:
+                self._log(f"内容缓存：命中 {counters['content_cache_hits']} 个文件，未命中 {counters['content_cache_misses']} 个文件")
+            decoders = [f"{key[len('decoder_'):]} {value} 个" for key, value in counters.items() if key.startswith("decoder_")]
+            if decoders:
+                self._log(f"解码顺序：{' → '.join(result.encodings)}；解码器使用：{'，'.join(decoders)}")
+
+            total_pages = result.total_pages
+            generated_pages = result.generated_pages
+            self._set_metric(self.metric_non_empty_files_var, str(result.non_empty_files))
+            self._set_metric(self.metric_lines_var, str(result.total_lines))
+            self._set_metric(self.metric_total_pages_var, f"约 {total_pages}" if result.pages_estimated else str(total_pages))
             self._set_metric(self.metric_output_pages_var, f"{generated_pages}" if total_pages <= 60 else f"{generated_pages}/{total_pages}")
-            self._log(f"生成完成：输出 {generated_pages} 页，耗时 {gen_duration:.2f} 秒", level="key")
             self._log(f"文件保存至：{output_path}", level="key")
                 
             self._set_status("完成")
             self._set_progress(100)
             
-            total_duration = time.time() - start_time
-            self._log(f"总耗时：{total_duration:.2f} 秒", level="key")
+            self._log(f"总耗时：{result.wall_time:.2f} 秒", level="key")
             self._last_output_path = output_path
             self.after(0, self._refresh_open_buttons)
             
+            total_lines = result.total_lines
             self.after(0, lambda: messagebox.showinfo("成功", f"文档生成成功！\n共 {generated_pages} 页\n代码总行数: {total_lines}"))
             
+        except PipelineCancelled:
+            self._log("任务已取消", level="key")
+            self._set_status("任务已取消")
+            self._set_progress(0)
         except Exception as e:
-            if str(e) == "任务已取消":
-                self._log("任务已取消", level="key")
-                self._set_status("任务已取消")
-                self._set_progress(0)
-            else:
-                self._log(f"错误：{str(e)}", level="danger")
-                self._set_status("发生错误")
-                self.after(0, lambda: messagebox.showerror("错误", str(e)))
+            self._log(f"错误：{str(e)}", level="danger")
+            self._set_status("发生错误")
+            self.after(0, lambda: messagebox.showerror("错误", str(e)))
         finally:
             self.after(0, lambda: self._set_running(False))
 
+    def _on_pipeline_progress(self, event: ProgressEvent):
+        """将流水线进度事件映射为状态栏、进度条与日志（后台线程调用）"""
+        if self.cancel_token.is_cancelled():
+            return
+
+        if event.stage == "scan":
+            if event.finished:
+                self._set_metric(self.metric_files_var, str(event.done))
+                self._log(f"扫描完成：{event.done} 个文件，耗时 {event.elapsed:.2f} 秒", level="key")
+                self._set_status("正在读取文件内容…")
+                self._set_progress(25)
+            else:
+                base = event.current or "完成"
+                self._set_status(f"扫描中：已找到 {event.done} 个文件（{base}）")
+                self._set_progress(min(18, 6 + (event.done % 12)))
+        elif event.stage == "read":
+            if event.finished:
+                self._log(f"读取完成：{event.done} 个文件，耗时 {event.elapsed:.2f} 秒", level="key")
+                self._set_status("正在排版并生成 PDF…")
+                self._set_progress(60)
+            else:
+                self._set_status(f"读取中（{event.done}/{event.total}）：{event.current}")
+                self._set_progress(25 + (event.done / max(1, event.total or 0)) * 35)
+        elif event.stage == "layout":
+            if event.finished:
+                self._log(f"排版完成：耗时 {event.elapsed:.2f} 秒", level="key")
+                self._set_progress(70)
+        elif event.stage == "render":
+            if event.finished:
+                self._log(f"生成完成：输出 {event.done} 页，耗时 {event.elapsed:.2f} 秒", level="key")
+                self._set_progress(95)
+
     def _set_running(self, running: bool):
         """切换界面运行/空闲状态的 UI 锁定"""
         if running:
@@ -0,0 +1,160 @@
+import os
+import pathlib
+import hashlib
+import pickle
+from array import array
+from typing import Optional
+
+from .page_index import PageIndex
+
+
+class LayoutCache:
+    """逐文件换行结果的缓存，用于增量排版
+
+    每个 (输出文件, 排版参数) 组合对应一个状态文件，记录上次排版的文件顺序、各文件逐行换行行数、
+    页索引与输出页面的摘要。再次生成时只重新计算内容变化的文件，页面边界从第一个变化的文件开始重算；
+    输出页面与上次完全相同且输出文件未被改动时可以跳过渲染。
+    """
+
+    # 缓存格式版本，格式或换行逻辑变化时递增以使旧缓存失效
+    VERSION = 1
+
+    def __init__(self, layout_key: str, output_path: str, cache_dir: Optional[str] = None):
+        """按排版参数与输出路径定位状态文件并读取上次的状态"""
+        self.cache_dir = cache_dir or self.default_cache_dir()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.layout_key = layout_key
+        scope = f"{self.VERSION}|{layout_key}|{os.path.abspath(output_path)}"
+        self.path = os.path.join(self.cache_dir, hashlib.sha1(scope.encode("utf-8", errors="surrogatepass")).hexdigest())
+
+        self.hits = 0
+        self.misses = 0
+        self.reused_pages = 0
+        self._counts: dict[str, array] = {}
+        self._keys: list[str] = []
+        self._index: Optional[PageIndex] = None
+        self._render: Optional[tuple] = None
+        self._load()
+
+        # 本次排版用到的条目（保存时只保留这些，缓存大小随项目规模而非历史累积）
+        self._used: dict[str, array] = {}
+
+    @staticmethod
+    def default_cache_dir() -> str:
+        """默认缓存目录（与 settings.db 同级的 data 目录下）"""
+        base = pathlib.Path(__file__).resolve().parent.parent
+        return os.path.join(base, "data", "layout_cache")
+
+    def _load(self) -> None:
+        """读取状态文件，不存在或损坏时视为空缓存"""
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") != self.VERSION or state.get("layout_key") != self.layout_key:
+                return
+            self._counts = state["counts"]
+            self._keys = state["keys"]
+            self._index = PageIndex.from_bytes(state["index"]) if state.get("index") else None
+            self._render = state.get("render")
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"读取排版缓存失败: {e}")
+            self._counts, self._keys, self._index, self._render = {}, [], None, None
+
+    @staticmethod
+    def key_for(filename: str, content: str) -> str:
+        """文件的缓存键：文件名（文件头行会参与换行）与清理前文本的摘要"""
+        digest = hashlib.sha1(filename.encode("utf-8", errors="surrogatepass"))
+        digest.update(b"\0")
+        digest.update(content.encode("utf-8", errors="surrogatepass"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[array]:
+        """读取文件的逐行换行行数，未命中返回 None"""
+        counts = self._used.get(key)
+        if counts is None:
+            counts = self._counts.get(key)
+            if counts is None:
+                self.misses += 1
+                return None
+            self._used[key] = counts
+        self.hits += 1
+        return counts
+
+    def put(self, key: str, counts: array) -> None:
+        """记录文件的逐行换行行数"""
+        self._used[key] = counts
+
+    def reuse_prefix(self, keys: list[str], index: PageIndex) -> tuple[int, int]:
+        """复用上次页索引中不受影响的部分：第一个变化文件之前开始的页面起点保持不变
+
+        把这些页面起点追加到 index，返回 (第一个变化文件的序号, 该文件首行的全局行号)。
+        """
+        prev_keys, prev_index = self._keys, self._index
+        if prev_index is None or prev_index.lines_per_page != index.lines_per_page:
+            return 0, 0
+        first_changed = 0
+        limit = min(len(keys), len(prev_keys))
+        while first_changed < limit and keys[first_changed] == prev_keys[first_changed]:
+            first_changed += 1
+
+        start_line = 0
+        for key in keys[:first_changed]:
+            counts = self._counts.get(key)
+            if counts is None:
+                return 0, 0
+            start_line += sum(counts)
+            self._used[key] = counts
+
+        pages = 0
+        while pages < len(prev_index) and prev_index.files[pages] < first_changed:
+            index.append(*prev_index[pages])
+            pages += 1
+        self.reused_pages = pages
+        self.hits += first_changed
+        return first_changed, start_line
+
+    def record(self, keys: list[str], index: PageIndex) -> None:
+        """记录本次排版的文件顺序与页索引，供下次增量排版"""
+        self._keys = keys
+        self._index = index
+
+    @staticmethod
+    def _output_stamp(output_path: str) -> Optional[tuple[int, int]]:
+        try:
+            st = os.stat(output_path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def render_unchanged(self, digest: str, output_path: str) -> bool:
+        """输出页面摘要与上次相同，且上次写出的文件未被改动或删除"""
+        stamp = self._output_stamp(output_path)
+        return stamp is not None and self._render == (digest, stamp)
+
+    def record_render(self, digest: str, output_path: str) -> None:
+        """记录本次写出的页面摘要与输出文件状态"""
+        self._render = (digest, self._output_stamp(output_path))
+
+    def save(self) -> None:
+        """写入状态文件（先写临时文件再原子替换）"""
+        state = {
+            "version": self.VERSION,
+            "layout_key": self.layout_key,
+            "counts": self._used,
+            "keys": self._keys,
+            "index": self._index.to_bytes() if self._index is not None else None,
+            "render": self._render,
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"写入排版缓存失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
@@ -0,0 +1,105 @@
+import os
+import struct
+import sys
+from array import array
+from typing import Optional
+
+
+class PageIndex:
+    """每页起点的紧凑索引：(文件序号, 源码行号, 行内换行偏移)
+
+    源码行号指 PDFGenerator._iter_source_lines 产出的行（第 0 行为文件头分隔符），
+    换行偏移指该源码行换行后的第几段。借助索引可以从任意页开始独立排版，无需从第一个文件重新计算。
+    """
+
+    MAGIC = b"SCPI"
+    VERSION = 1
+    _HEADER = struct.Struct("<4sHIQI")  # 魔数, 版本, 每页行数, 总行数, 排版参数长度
+
+    def __init__(self, lines_per_page: int, layout_key: str = "", total_lines: int = 0):
+        """创建空索引；layout_key 记录排版参数，参数不同的索引不能复用"""
+        self.lines_per_page = lines_per_page
+        self.layout_key = layout_key
+        self.total_lines = total_lines
+        self.files = array('l')
+        self.source_lines = array('l')
+        self.wrap_offsets = array('l')
+
+    def __len__(self) -> int:
+        """页数"""
+        return len(self.files)
+
+    def __getitem__(self, page: int) -> tuple[int, int, int]:
+        """第 page 页（从 0 开始）起点的 (文件序号, 源码行号, 换行偏移)"""
+        return self.files[page], self.source_lines[page], self.wrap_offsets[page]
+
+    def append(self, file_idx: int, source_line: int, wrap_offset: int) -> None:
+        """追加下一页的起点"""
+        self.files.append(file_idx)
+        self.source_lines.append(source_line)
+        self.wrap_offsets.append(wrap_offset)
+
+    def to_bytes(self) -> bytes:
+        """序列化为字节串（小端序）"""
+        key = self.layout_key.encode("utf-8")
+        parts = [self._HEADER.pack(self.MAGIC, self.VERSION, self.lines_per_page, self.total_lines, len(key)), key,
+                 struct.pack("<I", len(self))]
+        for column in (self.files, self.source_lines, self.wrap_offsets):
+            data = array('q', column)
+            if sys.byteorder != 'little':
+                data.byteswap()
+            parts.append(data.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "PageIndex":
+        """从 to_bytes 的结果恢复索引，格式不符时抛出 ValueError"""
+        try:
+            magic, version, lines_per_page, total_lines, key_len = cls._HEADER.unpack_from(data, 0)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise ValueError("页索引格式不兼容")
+            pos = cls._HEADER.size
+            key = data[pos:pos + key_len].decode("utf-8")
+            pos += key_len
+            count = struct.unpack_from("<I", data, pos)[0]
+            pos += 4
+        except struct.error as e:
+            raise ValueError(f"页索引已损坏: {e}") from e
+
+        index = cls(lines_per_page, key, total_lines)
+        size = 8 * count
+        if len(data) != pos + 3 * size:
+            raise ValueError("页索引长度不符")
+        for name in ("files", "source_lines", "wrap_offsets"):
+            column = array('q')
+            column.frombytes(data[pos:pos + size])
+            if sys.byteorder != 'little':
+                column.byteswap()
+            setattr(index, name, array('l', column))
+            pos += size
+        return index
+
+    @staticmethod
+    def default_path(output_path: str) -> str:
+        """与输出 PDF 同目录的索引文件路径"""
+        return f"{os.path.splitext(output_path)[0]}.pageidx"
+
+    def save(self, path: str) -> None:
+        """写入索引文件（先写临时文件再原子替换）"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, layout_key: Optional[str] = None) -> Optional["PageIndex"]:
+        """读取索引文件；不存在、损坏或排版参数不一致时返回 None"""
+        try:
+            with open(path, "rb") as f:
+                index = cls.from_bytes(f.read())
+        except (OSError, ValueError) as e:
+            print(f"读取页索引失败: {e}")
+            return None
+        if layout_key is not None and index.layout_key != layout_key:
+            return None
+        return index
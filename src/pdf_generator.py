@@ -1,21 +1,60 @@
 import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_right
 from collections import deque
+from itertools import accumulate, islice
+from array import array
 from reportlab.pdfgen import canvas
+from reportlab.pdfgen.textobject import PDFTextObject
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
+from .glyph_widths import GlyphWidthTable, WIDTH_SCALE
+from .font_cache import FontCache
+from .font_resolver import FontResolver
+from .pdf_writer import DirectPDFWriter, PageEncoder, fmt_num
+from .page_index import PageIndex
+from .layout_cache import LayoutCache
+
+# 逐行编码缓存依赖 reportlab 文本对象的内部接口，缺失时回退为 textLine
+_TEXT_OBJECT_INTERNALS = all(
+    hasattr(PDFTextObject, name) for name in ('_formatText', 'textLine')
+) and '_curSubset' in PDFTextObject.__init__.__code__.co_names
+
 # 字体注册单例，避免重复注册开销
 _FONT_REGISTERED = False
 _REGISTERED_FONT_NAME = 'Helvetica'
+_REGISTERED_FONT_PATH = None
+_REGISTERED_SUBFONT_INDEX = 0
 
 class PDFGenerator:
-    def __init__(self, output_path, software_name, version):
+    # 可选的 PDF 输出后端：reportlab 画布，或直接写出 PDF 对象的精简写入器
+    BACKENDS = ('reportlab', 'direct')
+    # 页眉中不随页码变化的部分（软件名、版本号与分割线）定义为表单 XObject 的名称
+    HEADER_FORM = 'Hdr'
+    # 多进程渲染时每个任务区间的最少页数（区间太小时进程间传输开销占比过高）
+    RENDER_CHUNK_MIN_PAGES = 16
+    # 多进程排版时每批提交的文本量（字符数）
+    LAYOUT_BATCH_CHARS = 1 << 20
+
+    def __init__(self, output_path, software_name, version, use_font_cache=True, backend='reportlab'):
         """初始化 PDF 生成器"""
         self.output_path = output_path
         self.software_name = software_name
         self.version = version
+        if backend not in self.BACKENDS:
+            raise ValueError(f"未知的 PDF 后端: {backend}")
+        self.backend = backend
+        # 字体解析结果与字形宽度表的磁盘缓存，避免每次启动重新解析 TTC
+        self._font_cache = None
+        if use_font_cache:
+            try:
+                self._font_cache = FontCache()
+            except OSError as e:
+                print(f"字体缓存不可用: {e}")
         
         # 页面布局配置 (A4 纸张)
         self.page_width, self.page_height = A4
@@ -33,6 +72,8 @@ class PDFGenerator:
         self.leading = 11   # 行间距
         
         self._register_font()
+        # 实际使用的字体文件（内置字体时为空），写入构建清单以便字体变化时重新生成
+        self.font_path = _REGISTERED_FONT_PATH if self.font_name != 'Helvetica' else None
         
         # 计算每页最大行数 (软著要求每页至少 50 行)
         self.lines_per_page = int(self.content_height / self.leading)
@@ -42,7 +83,20 @@ class PDFGenerator:
         # 字符宽度预估，用于换行计算
         self.avg_char_width = pdfmetrics.stringWidth('A', self.font_name, self.font_size)
         self.chars_per_line = int(self.content_width / self.avg_char_width)
-        self._char_width_cache = {}
+        # 按码位索引的字形宽度表，换行宽度上限使用同样的整数单位
+        self._glyph_widths = GlyphWidthTable(self.font_name, self.font_size)
+        self._glyph_widths_path = None
+        if self._font_cache is not None:
+            self._glyph_widths_path = self._font_cache.width_table_path(
+                self.font_name, _REGISTERED_FONT_PATH, self.font_size, _REGISTERED_SUBFONT_INDEX)
+            self._load_glyph_widths()
+        self._wrap_limit = int(self.content_width * WIDTH_SCALE)
+
+        # 使用文本对象渲染正文（False 时回退为逐行 drawString）
+        self.use_text_object = True
+        self._line_code_cache = {}
+        # 最近一次排版得到的页索引（流式排版或全量导出时为空）
+        self.page_index: PageIndex | None = None
 
     def _register_font(self):
         """注册中文字体（单例模式）"""
@@ -65,20 +119,17 @@ class PDFGenerator:
             found = False
             for name, path, index in font_candidates:
                 if os.path.exists(path):
-                    try:
-                        if path.lower().endswith('.ttc'):
-                            font = TTFont(name, path, subfontIndex=index if index is not None else 0)
-                        else:
-                            font = TTFont(name, path)
-                            
-                        pdfmetrics.registerFont(font)
-                        self.font_name = name
-                        print(f"成功注册字体: {name}, 路径: {path}")
+                    index = index if index is not None and path.lower().endswith('.ttc') else 0
+                    if self._try_register_font(name, path, index):
                         found = True
                         break
-                    except Exception as e:
-                        print(f"注册字体 {name} 失败: {e}")
-                        continue
+
+            if not found:
+                # 非 Windows 环境（如 Linux 构建机）通过系统字体索引查找中文字体
+                resolved = FontResolver().resolve_cjk()
+                if resolved is not None:
+                    name, info = resolved
+                    found = self._try_register_font(name, info.path, info.subfont_index)
             
             if not found:
                 print("警告: 未找到中文字体，回退至 Helvetica (不支持中文)。")
@@ -90,49 +141,397 @@ class PDFGenerator:
         _FONT_REGISTERED = True
         _REGISTERED_FONT_NAME = self.font_name
 
+    def _try_register_font(self, name, path, index) -> bool:
+        """注册单个字体文件，成功时记录为当前字体"""
+        global _REGISTERED_FONT_PATH, _REGISTERED_SUBFONT_INDEX
+        try:
+            if self._font_cache is not None:
+                font = self._font_cache.load_ttfont(name, path, index)
+            else:
+                font = TTFont(name, path, subfontIndex=index)
+                
+            pdfmetrics.registerFont(font)
+            self.font_name = name
+            _REGISTERED_FONT_PATH = path
+            _REGISTERED_SUBFONT_INDEX = index
+            print(f"成功注册字体: {name}, 路径: {path}")
+            return True
+        except Exception as e:
+            print(f"注册字体 {name} 失败: {e}")
+            return False
+
     def generate(self, file_contents: list[tuple[str, str]], check_cancel=None):
         """生成 PDF 文档，保留前 30 页和后 30 页（软著要求）"""
-        total_pages = 0
-        first_pages: list[list[str]] = []
-        tail_pages: deque[list[str]] = deque(maxlen=30)
+        total_pages, selected_pages = self.layout(file_contents, check_cancel)
+        if total_pages == 0:
+            return 0, 0
+        if not self.render(selected_pages, check_cancel):
+            return 0, 0
+        return total_pages, len(selected_pages)
+
+    def layout(self, file_contents: list[tuple[str, str]], check_cancel=None,
+               executor: ProcessPoolExecutor | None = None,
+               cache: LayoutCache | None = None, workers: int = 1) -> tuple[int, list[list[str]]]:
+        """排版：返回 (总页数, 需要输出的页面行列表)，取消时返回 (0, [])；
+        executor 为可选的排版进程池（workers 为其进程数），cache 为可选的排版缓存
+        """
+        # 第一遍：只计算换行断点并记录每页起点，不构造任何字符串
+        index = self.build_page_index(file_contents, check_cancel, executor, cache, workers)
+        if index is None:
+            return 0, []
+        self.page_index = index
+        total_pages = len(index)
+        if total_pages == 0:
+            return 0, []
+
+        # 第二遍：借助页索引只排版前 30 页与后 30 页窗口
+        selected_pages: list[list[str]] = []
+        for start_page, end_page in self._page_windows(total_pages):
+            for page_lines in self.iter_indexed_pages(file_contents, index, start_page, end_page, check_cancel):
+                selected_pages.append(page_lines)
+            if check_cancel and check_cancel():
+                return 0, []
+
+        return total_pages, selected_pages
+
+    def pages_digest(self, selected_pages: list[list[str]]) -> str:
+        """输出内容的摘要：页面文本、页眉信息、排版参数与输出后端，摘要不变则渲染结果不变"""
+        digest = hashlib.sha1(f"{self.software_name}\0{self.version}\0{self.backend}\0{self.layout_key()}".encode(
+            "utf-8", errors="surrogatepass"))
+        for page_lines in selected_pages:
+            digest.update(b"\f")
+            digest.update("\n".join(page_lines).encode("utf-8", errors="surrogatepass"))
+        return digest.hexdigest()
+
+    def layout_key(self) -> str:
+        """影响分页结果的排版参数，页索引只能在参数一致时复用"""
+        return (f"{self.font_name}|{self.font_size}|{self.leading}|{self.lines_per_page}"
+                f"|{self.chars_per_line}|{self._wrap_limit}")
+
+    def build_page_index(self, file_contents: list[tuple[str, str]], check_cancel=None,
+                         executor: ProcessPoolExecutor | None = None,
+                         cache: LayoutCache | None = None, workers: int = 1) -> PageIndex | None:
+        """计算每页起点 (文件序号, 源码行号, 换行偏移)，取消时返回 None
+
+        传入 create_worker_pool 创建的进程池（workers 为其进程数）时，各文件的逐行换行行数在工作进程中并行计算，
+        主进程只按文件顺序做前缀和确定页面边界，结果与串行计算完全一致。
+        传入排版缓存时只计算内容变化的文件，页面边界从第一个变化的文件开始重算。
+        """
+        index = PageIndex(self.lines_per_page, self.layout_key())
+        total = 0
+        start_file = 0
+        pending = file_contents
+        keys = None
+        if cache is not None:
+            keys = [cache.key_for(filename, content) for filename, content in file_contents]
+            start_file, total = cache.reuse_prefix(keys, index)
+            known = {i: cache.get(keys[i]) for i in range(start_file, len(file_contents))}
+            pending = [file_contents[i] for i, counts in known.items() if counts is None]
+
+        if executor is None:
+            computed = (self._line_counts(filename, content) for filename, content in pending)
+        else:
+            computed = self._line_counts_parallel(pending, executor, workers)
+
+        for file_idx in range(start_file, len(file_contents)):
+            if check_cancel and check_cancel():
+                return None
+            counts = known[file_idx] if keys is not None else None
+            if counts is None:
+                counts = next(computed)
+                if keys is not None:
+                    cache.put(keys[file_idx], counts)
+            total += self._index_file(index, file_idx, counts, total)
+        index.total_lines = total
+        if cache is not None:
+            cache.record(keys, index)
+        return index
+
+    def _line_counts(self, filename, content) -> array:
+        """文件（含文件头）每个源码行换行后的物理行数"""
+        lines = list(self._iter_source_lines(filename, content))
+        return array('l', [1 if b is None else len(b) for b in self._wrap_breaks(lines)])
+
+    def _line_counts_parallel(self, file_contents, executor: ProcessPoolExecutor, workers: int):
+        """按文件顺序产出各文件的逐行换行行数：文件按文本量分批提交到进程池，在途批次数不超过进程数的两倍"""
+        batches = []
+        batch, size = [], 0
+        for item in file_contents:
+            batch.append(item)
+            size += len(item[1])
+            if size >= self.LAYOUT_BATCH_CHARS:
+                batches.append(batch)
+                batch, size = [], 0
+        if batch:
+            batches.append(batch)
+
+        pending = deque()
+        window = 2 * max(1, workers)
+        for batch in batches:
+            pending.append(executor.submit(_line_counts_batch, batch))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+    def create_worker_pool(self, workers: int) -> ProcessPoolExecutor:
+        """创建排版/渲染共用的进程池，每个工作进程以相同参数初始化一个生成器"""
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker,
+                                   initargs=(self.output_path, self.software_name, self.version,
+                                             self._font_cache is not None))
+
+    def _index_file(self, index: PageIndex, file_idx: int, counts, start: int) -> int:
+        """记录起点落在该文件内的页面，counts 为逐行换行行数，start 为文件首行的全局行号；返回文件换行后的行数"""
+        end = start + sum(counts)
+        next_start = len(index) * index.lines_per_page
+        if next_start < end:
+            cum = list(accumulate(counts, initial=0))
+            while next_start < end:
+                rel = next_start - start
+                source_line = bisect_right(cum, rel) - 1
+                index.append(file_idx, source_line, rel - cum[source_line])
+                next_start += index.lines_per_page
+        return end - start
+
+    def iter_indexed_pages(self, file_contents, index: PageIndex, start_page: int, end_page: int, check_cancel=None):
+        """借助页索引独立排版 [start_page, end_page) 范围内的页面，不触碰起点之前的文件"""
+        end_page = min(end_page, len(index))
+        if start_page >= end_page:
+            return
+        lines_per_page = index.lines_per_page
+        remaining = min(end_page * lines_per_page, index.total_lines) - start_page * lines_per_page
+        file_idx, source_line, skip = index[start_page]
+        yield from self._iter_pages_from(file_contents, file_idx, source_line, skip, remaining, check_cancel)
+
+    def _iter_pages_from(self, file_contents, file_idx: int, source_line: int, skip: int, remaining: int,
+                         check_cancel=None):
+        """从 (文件序号, 源码行号, 换行偏移) 处开始排版 remaining 行，起点须为页首"""
+        lines_per_page = self.lines_per_page
+        current_page_lines = []
 
-        for page_lines in self._iter_pages(file_contents, check_cancel):
+        while remaining > 0 and file_idx < len(file_contents):
             if check_cancel and check_cancel():
-                return 0, 0
-            total_pages += 1
-            if total_pages <= 60:
-                first_pages.append(page_lines)
+                return
+            filename, content = file_contents[file_idx]
+            for w_line in self._iter_wrapped_lines(filename, content, skip, source_line):
+                current_page_lines.append(w_line)
+                remaining -= 1
+                if len(current_page_lines) >= lines_per_page:
+                    yield current_page_lines
+                    current_page_lines = []
+                if remaining == 0:
+                    break
+            source_line = skip = 0
+            file_idx += 1
+
+        if current_page_lines:
+            yield current_page_lines
+
+    def layout_ends(self, head_contents, tail_contents, total_lines: int, tail_counts: list[int] | None = None,
+                    check_cancel=None) -> list[list[str]]:
+        """只凭文档开头与结尾的文件排版前 30 页与后 30 页
+
+        head_contents 须至少排满 30 页，tail_contents 须覆盖后 30 页；
+        total_lines 为全文换行后的总行数（可以是估算值），只用于确定后 30 页的分页位置。
+        """
+        pages = list(islice(self._iter_pages(head_contents, check_cancel), 30))
+        pages.extend(self.iter_tail_pages(tail_contents, total_lines, 30, tail_counts, check_cancel))
+        return pages
+
+    def iter_tail_pages(self, file_contents, total_lines: int, page_count: int = 30,
+                        line_counts: list[int] | None = None, check_cancel=None):
+        """倒序排版文档的最后 page_count 页
+
+        从最后一个文件向前累计换行后的行数，覆盖所需行数即停止，再从该位置正向排版，
+        耗时只与尾部内容相关。file_contents 为文档结尾的若干文件（可以是全部文件），
+        total_lines 为全文总行数，决定最后一页的行数（total_lines 除以每页行数的余数）；
+        line_counts 为与 file_contents 对应的已知行数，缺省时按需计算。
+        """
+        lines_per_page = self.lines_per_page
+        total_pages = -(-total_lines // lines_per_page)
+        page_count = min(page_count, total_pages)
+        need = total_lines - (total_pages - page_count) * lines_per_page
+        if need <= 0:
+            return
+
+        covered = 0
+        idx = len(file_contents)
+        while covered < need and idx > 0:
+            if check_cancel and check_cancel():
+                return
+            idx -= 1
+            if line_counts is not None:
+                covered += line_counts[idx]
             else:
-                tail_pages.append(page_lines)
+                filename, content = file_contents[idx]
+                covered += self._count_wrapped_lines(list(self._iter_source_lines(filename, content)))
+        if covered < need:
+            raise ValueError("结尾文件不足以排满所需页数")
+        yield from self._iter_pages_from(file_contents, idx, 0, covered - need, need, check_cancel)
 
-        if total_pages == 0:
+    def render(self, selected_pages: list[list[str]], check_cancel=None, first_page: int = 1) -> bool:
+        """将排版好的页面写入 PDF 文件，页眉页码从 first_page 开始；取消时返回 False"""
+        c = self.begin_render()
+        for i, page_lines in enumerate(selected_pages):
+            if check_cancel and check_cancel():
+                self.abort_render(c)
+                return False
+            self.render_page(c, page_lines, first_page + i)
+        self.end_render(c)
+        return True
+
+    def generate_full(self, file_contents: list[tuple[str, str]], check_cancel=None):
+        """全量导出：不做 30+30 页截取，逐页排版并立即写盘，内存占用与页数无关
+
+        reportlab 画布在 save() 之前会保留全部已完成页面，因此全量导出固定使用直接写入器。
+        """
+        c = self.begin_render(backend='direct')
+        layout = StreamingLayout(self, full=True)
+        page_num = 0
+        for filename, content in file_contents:
+            if check_cancel and check_cancel():
+                break
+            for page_lines in layout.feed(filename, content):
+                page_num += 1
+                self.render_page(c, page_lines, page_num)
+        for page_lines in layout.finish()[1]:
+            page_num += 1
+            self.render_page(c, page_lines, page_num)
+        if page_num == 0 or (check_cancel and check_cancel()):
+            self.abort_render(c)
             return 0, 0
+        self.end_render(c)
+        self.page_index = layout.page_index
+        return page_num, page_num
 
-        # 合并需要导出的页面 (前 30 + 后 30 或全部)
-        if total_pages <= 60:
-            selected_pages = first_pages
-        else:
-            selected_pages = first_pages[:30] + list(tail_pages)
+    def generate_parallel(self, file_contents: list[tuple[str, str]], workers: int, full: bool = False,
+                          check_cancel=None):
+        """多进程渲染：按页索引把输出页切分为若干区间，各工作进程独立排版并编码页面内容流，
+        主进程按顺序写入同一个直接写入器并合并字体子集。返回 (总页数, 输出页数)，取消时返回 (0, 0)
+        """
+        executor = self.create_worker_pool(workers)
+        try:
+            return self._generate_with_pool(file_contents, executor, workers, full, check_cancel)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
 
-        c = canvas.Canvas(self.output_path, pagesize=A4)
+    def _generate_with_pool(self, file_contents, executor: ProcessPoolExecutor, workers: int, full: bool,
+                            check_cancel=None):
+        """generate_parallel 的主体：排版计数与页面编码共用同一个进程池"""
+        index = self.build_page_index(file_contents, check_cancel, executor, workers=workers)
+        if index is None or len(index) == 0:
+            return 0, 0
+        self.page_index = index
+        total_pages = len(index)
+        windows = [(0, total_pages)] if full else self._page_windows(total_pages)
+
+        # 切分任务：每个区间只携带它涉及的文件，页码按在输出文档中的位置连续编号
+        tasks = []
+        first_page = 1
+        chunk = max(self.RENDER_CHUNK_MIN_PAGES, -(-sum(b - a for a, b in windows) // (workers * 4)))
+        for start_page, end_page in windows:
+            for a in range(start_page, end_page, chunk):
+                b = min(a + chunk, end_page)
+                file_idx, source_line, skip = index[a]
+                last_file = index[b][0] if b < total_pages else len(file_contents) - 1
+                line_count = min(b * self.lines_per_page, index.total_lines) - a * self.lines_per_page
+                tasks.append((file_contents[file_idx:last_file + 1], source_line, skip, line_count, first_page))
+                first_page += b - a
+
+        c = self.begin_render(backend='direct')
+        generated = 0
+        pending = deque()
+        try:
+            task_iter = iter(tasks)
+            # 限制同时在途的区间数，主进程写盘较慢时不会无限堆积已编码的页面
+            for task in task_iter:
+                pending.append(executor.submit(_render_page_range, *task, c.compress_level))
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                if check_cancel and check_cancel():
+                    self.abort_render(c)
+                    return 0, 0
+                font_name, usage, pages = pending.popleft().result()
+                if font_name != self.font_name:
+                    raise RuntimeError(f"工作进程使用的字体 ({font_name}) 与主进程 ({self.font_name}) 不一致")
+                c.merge_usage(usage)
+                for data in pages:
+                    c.add_encoded_page(data)
+                generated += len(pages)
+                task = next(task_iter, None)
+                if task is not None:
+                    pending.append(executor.submit(_render_page_range, *task, c.compress_level))
+        except BaseException:
+            self.abort_render(c)
+            raise
+        self.end_render(c)
+        return total_pages, generated
+
+    def begin_render(self, backend=None):
+        """创建画布（或直接写入器），开始逐页渲染；backend 为空时使用构造时选择的后端"""
         print(f"[PDF] 开始生成，使用字体: {self.font_name}, 软件名: {self.software_name}")
+        if (backend or self.backend) == 'direct':
+            writer = DirectPDFWriter(self.output_path, A4, self.font_name, title=f"{self.software_name} {self.version}")
+            writer.add_form(self.HEADER_FORM, self._header_form_stream(writer))
+            return writer
+        c = canvas.Canvas(self.output_path, pagesize=A4)
         c.setFont(self.font_name, self.font_size)
+        # 行编码缓存只在同一文档内有效（TrueType 子集按文档分配）
+        self._line_code_cache = {}
+        self._define_header_form(c)
+        return c
+
+    def render_page(self, c, page_lines: list[str], page_num: int):
+        """渲染单页（页眉 + 内容）"""
+        if isinstance(c, DirectPDFWriter):
+            c.add_page(self._page_stream(c, page_lines, page_num))
+            return
+        self._draw_header(c, page_num)
         
-        for i, page_lines in enumerate(selected_pages):
-            if check_cancel and check_cancel():
-                return 0, 0
-            
-            c.setFont(self.font_name, self.font_size)
-            page_num = i + 1
-            self._draw_header(c, page_num)
-            
+        if self.use_text_object:
+            self._draw_content_text(c, page_lines)
+        else:
             c.setFont(self.font_name, self.font_size)
             self._draw_content(c, page_lines)
-            
-            c.showPage()
-            
-        c.save()
-        return total_pages, len(selected_pages)
+        
+        c.showPage()
+
+    def end_render(self, c):
+        """保存 PDF 文件"""
+        if isinstance(c, DirectPDFWriter):
+            c.close()
+        else:
+            c.save()
+        self.save_glyph_widths()
+
+    def abort_render(self, c):
+        """取消渲染：直接写入器会删除未完成的输出文件，reportlab 画布尚未写盘无需处理"""
+        if isinstance(c, DirectPDFWriter):
+            c.abort()
+
+    def _load_glyph_widths(self):
+        """从磁盘缓存恢复字形宽度表"""
+        try:
+            with open(self._glyph_widths_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return
+        if not self._glyph_widths.loads(data):
+            print("字形宽度缓存与当前字体不匹配，已忽略")
+
+    def save_glyph_widths(self):
+        """有新测量的宽度时写回磁盘缓存"""
+        if self._glyph_widths_path and self._glyph_widths.dirty:
+            self._font_cache.write_bytes(self._glyph_widths_path, self._glyph_widths.dumps())
+            self._glyph_widths.dirty = False
+
+    @staticmethod
+    def _page_windows(total_pages: int) -> list[tuple[int, int]]:
+        """返回需要输出的页码区间（左闭右开，从 0 开始）"""
+        if total_pages <= 60:
+            return [(0, total_pages)]
+        return [(0, 30), (total_pages - 30, total_pages)]
 
     def _iter_pages(self, file_contents, check_cancel=None):
         """迭代生成页面内容，处理自动换行"""
@@ -142,109 +541,287 @@ class PDFGenerator:
         for filename, content in file_contents:
             if check_cancel and check_cancel():
                 return
-                
-            # 写入文件头分隔符
-            header_line = f"--- File: {filename} ---"
-            wrapped_header = self._wrap_line(header_line)
-            
-            for line in wrapped_header:
+
+            for w_line in self._iter_wrapped_lines(filename, content):
                 if current_lines_count >= self.lines_per_page:
                     yield current_page_lines
                     current_page_lines = []
                     current_lines_count = 0
-                current_page_lines.append(line)
+                current_page_lines.append(w_line)
                 current_lines_count += 1
-            
-            # 处理制表符和连续空行
-            content = content.replace('\t', '    ')
-            lines = content.splitlines()
-            
-            cleaned_lines = []
-            last_empty = False
-            for l in lines:
-                is_empty = not l.strip()
-                if is_empty:
-                    if not last_empty:
-                        cleaned_lines.append("")
-                    last_empty = True
-                else:
-                    cleaned_lines.append(l)
-                    last_empty = False
-            
-            # 写入文件内容并自动换行
-            for line in cleaned_lines:
-                wrapped = self._wrap_line(line)
-                for w_line in wrapped:
-                    if current_lines_count >= self.lines_per_page:
-                        yield current_page_lines
-                        current_page_lines = []
-                        current_lines_count = 0
-                    current_page_lines.append(w_line)
-                    current_lines_count += 1
                     
         if current_page_lines:
             yield current_page_lines
 
-    def _wrap_line(self, line):
-        """根据页面宽度进行物理换行计算"""
-        if not line:
-            return [""]
+    @staticmethod
+    def _iter_source_lines(filename, content):
+        """依次产出文件头分隔符与清理后的源码行（展开制表符、合并连续空行）"""
+        yield f"--- File: {filename} ---"
 
-        # 快速路径：纯 ASCII 且长度安全
-        if line.isascii() and len(line) <= self.chars_per_line:
-            return [line]
+        content = content.replace('\t', '    ')
+        last_empty = False
+        for l in content.splitlines():
+            if not l.strip():
+                if not last_empty:
+                    yield ""
+                last_empty = True
+            else:
+                yield l
+                last_empty = False
+
+    def _iter_wrapped_lines(self, filename, content, skip: int = 0, start_line: int = 0):
+        """产出文件换行后的物理行，从第 start_line 个源码行开始并跳过其后 skip 行，不构造被跳过的字符串"""
+        lines = list(self._iter_source_lines(filename, content))
+        if start_line:
+            lines = lines[start_line:]
+        for line, breaks in zip(lines, self._wrap_breaks(lines)):
+            if skip:
+                count = 1 if breaks is None else len(breaks)
+                if skip >= count:
+                    skip -= count
+                    continue
+                wrapped = self._split_at(line, breaks)[skip:]
+                skip = 0
+            elif breaks is None:
+                yield line
+                continue
+            else:
+                wrapped = self._split_at(line, breaks)
+            yield from wrapped
+
+    def _wrap_breaks(self, lines: list[str]) -> list[list[int] | None]:
+        """批量计算换行断点：None 表示无需换行，否则为每段的结束下标"""
+        results: list[list[int] | None] = [None] * len(lines)
+        chars_per_line = self.chars_per_line
+        # 快速路径：空行或纯 ASCII 且长度安全的行无需查表
+        pending = [i for i, line in enumerate(lines)
+                   if line and not (line.isascii() and len(line) <= chars_per_line)]
+        if pending:
+            breaks = self._glyph_widths.batch_break_points([lines[i] for i in pending], self._wrap_limit)
+            for i, b in zip(pending, breaks):
+                results[i] = b
+        return results
 
-        full_width = pdfmetrics.stringWidth(line, self.font_name, self.font_size)
-        if full_width <= self.content_width:
+    @staticmethod
+    def _split_at(line: str, breaks: list[int] | None) -> list[str]:
+        """按断点切分一行"""
+        if breaks is None:
             return [line]
+        start = 0
+        parts = []
+        for end in breaks:
+            parts.append(line[start:end])
+            start = end
+        return parts
 
-        wrapped_lines = []
-        current_chars = []
-        current_width = 0.0
-        cache = self._char_width_cache
-
-        for char in line:
-            width = cache.get(char)
-            if width is None:
-                width = pdfmetrics.stringWidth(char, self.font_name, self.font_size)
-                cache[char] = width
-
-            if current_chars and current_width + width > self.content_width:
-                wrapped_lines.append("".join(current_chars))
-                current_chars = [char]
-                current_width = width
-            else:
-                current_chars.append(char)
-                current_width += width
+    def _count_wrapped_lines(self, lines: list[str]) -> int:
+        """批量计算多行换行后的物理行总数，不构造字符串"""
+        return sum(1 if b is None else len(b) for b in self._wrap_breaks(lines))
 
-        if current_chars:
-            wrapped_lines.append("".join(current_chars))
+    def _wrap_line(self, line):
+        """根据页面宽度进行物理换行计算"""
+        if not line:
+            return [""]
+        return self._split_at(line, self._wrap_breaks([line])[0])
 
-        return wrapped_lines
+    def _wrap_lines(self, lines: list[str]) -> list[list[str]]:
+        """批量换行：一次查表与前缀和完成多行的换行计算"""
+        return [self._split_at(line, b) for line, b in zip(lines, self._wrap_breaks(lines))]
+
+    def _define_header_form(self, c):
+        """把页眉的固定部分（软件名、版本号与分割线）定义为表单，每页只引用一次"""
+        header_y = self.page_height - 15 * mm
+        c.beginForm(self.HEADER_FORM)
+        c.setFont(self.font_name, 10)
+        c.drawString(self.margin_left, header_y, f"{self.software_name} {self.version}")
+        c.line(self.margin_left, header_y - 2*mm, self.page_width - self.margin_right, header_y - 2*mm)
+        c.endForm()
 
     def _draw_header(self, c, page_num):
-        """绘制页眉 (软件名、版本号、页码)"""
+        """绘制页眉：引用固定部分的表单，只绘制右对齐的页码"""
         header_y = self.page_height - 15 * mm
         c.saveState()
+        c.doForm(self.HEADER_FORM)
         c.setFont(self.font_name, 10)
         
-        left_text = f"{self.software_name} {self.version}"
         right_text = f"第 {page_num} 页"
         
-        c.drawString(self.margin_left, header_y, left_text)
-        
         # 右对齐页码
         page_num_width = c.stringWidth(right_text, self.font_name, 10)
         c.drawString(self.page_width - self.margin_right - page_num_width, header_y, right_text)
         
-        # 绘制分割线
-        c.line(self.margin_left, header_y - 2*mm, self.page_width - self.margin_right, header_y - 2*mm)
-        
         c.restoreState()
 
+    def _header_form_stream(self, writer: PageEncoder) -> str:
+        """直接写入器的页眉表单内容流：软件名、版本号与分割线"""
+        header_y = self.page_height - 15 * mm
+        x, y, line_y = fmt_num(self.margin_left), fmt_num(header_y), fmt_num(header_y - 2 * mm)
+        return "\n".join([
+            f"BT {writer.FONT_REF} 10 Tf 12 TL 1 0 0 1 {x} {y} Tm "
+            f"{writer.show(f'{self.software_name} {self.version}', 10)} T* ET",
+            f"{x} {line_y} m {fmt_num(self.page_width - self.margin_right)} {line_y} l S",
+        ])
+
+    def _page_stream(self, writer: PageEncoder, lines: list[str], page_num: int) -> str:
+        """直接写入器的页面内容流：引用页眉表单，再绘制页码与正文（与 reportlab 画布绘制结果相同）"""
+        header_y = self.page_height - 15 * mm
+        right_text = f"第 {page_num} 页"
+        right_x = self.page_width - self.margin_right - pdfmetrics.stringWidth(right_text, self.font_name, 10)
+        font = writer.FONT_REF
+
+        parts = [
+            f"/{self.HEADER_FORM} Do",
+            f"BT {font} 10 Tf 12 TL 1 0 0 1 {fmt_num(right_x)} {fmt_num(header_y)} Tm {writer.show(right_text, 10)} T* ET",
+            f"BT 1 0 0 1 {fmt_num(self.margin_left)} {fmt_num(self.page_height - self.margin_top - self.leading)} Tm "
+            f"{font} {fmt_num(self.font_size)} Tf {fmt_num(self.leading)} TL",
+        ]
+        parts.extend(f"{ops} T*" for ops in writer.show_lines(lines, self.font_size))
+        parts.append("ET")
+        return "\n".join(parts)
+
     def _draw_content(self, c, lines):
-        """在页面上绘制内容行"""
+        """在页面上绘制内容行（逐行 drawString，保留用于基准对比）"""
         y = self.page_height - self.margin_top
         for line in lines:
             y -= self.leading
             c.drawString(self.margin_left, y, line)
+
+    def _draw_content_text(self, c, lines):
+        """用单个文本对象绘制整页内容：一次设置字体与固定行距，每行只追加一个 T* 操作"""
+        # 首行基线与逐行 drawString 一致：距内容区顶部一个行距
+        t = c.beginText(self.margin_left, self.page_height - self.margin_top - self.leading)
+        t.setFont(self.font_name, self.font_size, self.leading)
+        # TrueType 字体的 Tf/TL 会延迟到首个非空行才输出，显式设置行距以免空首行沿用画布默认行距
+        t.setLeading(self.leading)
+
+        if not _TEXT_OBJECT_INTERNALS:
+            for line in lines:
+                t.textLine(line)
+            c.drawText(t)
+            return
+
+        # 缓存每行编码后的文本操作符；TrueType 字体还需记录子集切换状态
+        cache = self._line_code_cache
+        code = t._code
+        for line in lines:
+            key = (line, t._curSubset)
+            hit = cache.get(key)
+            if hit is None:
+                hit = (t._formatText(line), t._curSubset)
+                cache[key] = hit
+            else:
+                t._curSubset = hit[1]
+            code.append(f"{hit[0]} T*")
+        c.drawText(t)
+
+
+class StreamingLayout:
+    """流式排版：按文件顺序逐个喂入，前 30 页即时产出；
+    其余文件只保留可能落入后 30 页的部分，内存占用与输出规模相关而与项目规模无关。
+    full=True 时为全量导出：每页排满即产出，不保留任何文件
+    """
+
+    def __init__(self, generator: PDFGenerator, full: bool = False):
+        """初始化流式排版状态"""
+        self.generator = generator
+        self.full = full
+        self.lines_per_page = generator.lines_per_page
+        self.head_limit = 30 * self.lines_per_page
+        # 后 30 页起始行必然大于 (总行数 - 31 页行数)，更早结束的文件可以丢弃
+        self.tail_keep = 31 * self.lines_per_page
+        self.total_lines = 0
+        self.head_pages_emitted = 0
+        self._files_fed = 0
+        self._current_page: list[str] = []
+        self._tail: deque[tuple[int, str, str]] = deque()
+        self._tail_ends: deque[int] = deque()
+        # 边喂入边记录每页起点，排版结束后即为完整的页索引
+        self.page_index = PageIndex(self.lines_per_page, generator.layout_key())
+
+    def feed(self, filename: str, content: str) -> list[list[str]]:
+        """喂入下一个文件，返回因此排满的页面（非全量模式下只返回前部页面）"""
+        generator = self.generator
+        file_idx = self._files_fed
+        self._files_fed += 1
+        lines = list(generator._iter_source_lines(filename, content))
+        breaks = generator._wrap_breaks(lines)
+        start = self.total_lines
+        counts = [1 if b is None else len(b) for b in breaks]
+        self.total_lines += generator._index_file(self.page_index, file_idx, counts, start)
+        self.page_index.total_lines = self.total_lines
+
+        if self.full:
+            pages = []
+            for line, b in zip(lines, breaks):
+                for w_line in generator._split_at(line, b):
+                    self._current_page.append(w_line)
+                    if len(self._current_page) >= self.lines_per_page:
+                        pages.append(self._current_page)
+                        self._current_page = []
+            self.head_pages_emitted += len(pages)
+            return pages
+
+        pages = []
+        if start < self.head_limit:
+            remaining = self.head_limit - start
+            wrapped = (w_line for line, b in zip(lines, breaks) for w_line in generator._split_at(line, b))
+            for w_line in wrapped:
+                if remaining == 0:
+                    break
+                remaining -= 1
+                self._current_page.append(w_line)
+                if len(self._current_page) >= self.lines_per_page:
+                    pages.append(self._current_page)
+                    self._current_page = []
+            self.head_pages_emitted += len(pages)
+
+        self._tail.append((start, filename, content))
+        self._tail_ends.append(self.total_lines)
+        while self._tail_ends and self._tail_ends[0] <= self.total_lines - self.tail_keep:
+            self._tail.popleft()
+            self._tail_ends.popleft()
+        return pages
+
+    def finish(self, check_cancel=None) -> tuple[int, list[list[str]]]:
+        """所有文件喂入完毕后返回 (总页数, 剩余需要输出的页面)"""
+        total_pages = -(-self.total_lines // self.lines_per_page)
+        if total_pages <= 30 or self.full:
+            return total_pages, [self._current_page] if self._current_page else []
+
+        if total_pages <= 60:
+            start_page = self.head_pages_emitted
+        else:
+            start_page = total_pages - 30
+
+        file_contents = [(filename, content) for _, filename, content in self._tail]
+        counts = [end - start for (start, _, _), end in zip(self._tail, self._tail_ends)]
+        pages = list(self.generator.iter_tail_pages(file_contents, self.total_lines, total_pages - start_page,
+                                                    counts, check_cancel))
+        return total_pages, pages
+
+
+# 多进程排版/渲染的工作进程状态：每个进程只创建一次生成器（字体注册与字形宽度表可复用）
+_WORKER_GENERATOR: PDFGenerator | None = None
+
+
+def _init_render_worker(output_path, software_name, version, use_font_cache):
+    """工作进程初始化：注册字体并创建生成器"""
+    global _WORKER_GENERATOR
+    _WORKER_GENERATOR = PDFGenerator(output_path, software_name, version, use_font_cache=use_font_cache,
+                                     backend='direct')
+
+
+def _line_counts_batch(file_contents):
+    """在工作进程中计算一批文件的逐行换行行数"""
+    generator = _WORKER_GENERATOR
+    return [generator._line_counts(filename, content) for filename, content in file_contents]
+
+
+def _render_page_range(file_contents, source_line, skip, line_count, first_page, compress_level):
+    """在工作进程中排版并编码一段连续页面，返回 (字体名, 字体使用记录, 压缩后的页面内容流列表)"""
+    generator = _WORKER_GENERATOR
+    encoder = PageEncoder(generator.font_name, compress_level)
+    pages = []
+    for i, page_lines in enumerate(generator._iter_pages_from(file_contents, 0, source_line, skip, line_count)):
+        pages.append(encoder.compress(generator._page_stream(encoder, page_lines, first_page + i)))
+    return generator.font_name, encoder.usage(), pages
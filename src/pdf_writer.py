@@ -0,0 +1,373 @@
+import os
+import zlib
+from array import array
+from typing import Optional
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+
+def fmt_num(value: float) -> str:
+    """格式化 PDF 数值：最多 5 位小数并去掉多余的 0"""
+    text = f"{value:.5f}".rstrip("0").rstrip(".")
+    return text if text not in ("", "-0") else "0"
+
+
+def _escape_literal(data: bytes) -> bytes:
+    """转义 PDF 字面量字符串中的特殊字符"""
+    return (data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+            .replace(b"\r", b"\\r").replace(b"\n", b"\\n"))
+
+
+class _TrueTypeEncoder:
+    """TrueType 字体按 Identity-H 编码，CID 直接取 Unicode 码位（UTF-16BE 编码即为内容流字节），
+    文档结束时按用到的字符生成一个子集，并通过 CIDToGIDMap 映射到子集字形号"""
+
+    def __init__(self, font: TTFont, font_ref: str):
+        self.font_ref = font_ref
+        self.face = font.face
+        self._used: set[str] = set(map(chr, range(32, 127)))
+
+    def show(self, text: str, font_ref: str, size: str) -> str:
+        """返回在当前字体下显示 text 的操作符"""
+        return self.show_lines([text], font_ref, size)[0]
+
+    def show_lines(self, lines: list[str], font_ref: str, size: str) -> list[str]:
+        """整页一次编码，再按各行长度切分为逐行的显示操作符"""
+        text = "".join(lines)
+        encoded = text.encode("utf-16-be", errors="surrogatepass")
+        # 可打印 ASCII 已预先加入子集，纯可打印 ASCII 的页面无需记录字符
+        if not (text.isascii() and text.isprintable()):
+            self._used.update(text)
+            if len(encoded) != 2 * len(text):
+                # 超出 BMP 的字符无法用单个 2 字节 CID 表示，按缺字处理（保持字符数不变以便切分）
+                text = "".join(ch if ch <= "\uffff" else "\x00" for ch in text)
+                encoded = text.encode("utf-16-be", errors="surrogatepass")
+        encoded = encoded.hex()
+        ops = []
+        pos = 0
+        for line in lines:
+            end = pos + 4 * len(line)
+            ops.append(f"<{encoded[pos:end]}> Tj")
+            pos = end
+        return ops
+
+    def usage(self) -> set[str]:
+        """已用到的字符（用于合并多个进程分别编码的页面）"""
+        return self._used
+
+    def merge_usage(self, usage: set[str]) -> None:
+        """并入其他编码器用到的字符"""
+        self._used.update(usage)
+
+    def _subset_glyphs(self, codes: list[int]) -> dict[int, int]:
+        """与 TTFontFile.makeSubset 相同的编号规则：按顺序为原字形分配子集字形号，0 为缺字"""
+        char_to_glyph = self.face.charToGlyph
+        orig_to_new = {0: 0}
+        code_to_glyph = {}
+        for code in codes:
+            orig = char_to_glyph.get(code, 0)
+            new = orig_to_new.get(orig)
+            if new is None:
+                new = orig_to_new[orig] = len(orig_to_new)
+            code_to_glyph[code] = new
+        return code_to_glyph
+
+    def write_fonts(self, writer: "DirectPDFWriter") -> dict[str, int]:
+        """写出 Type0 字体及其子集、字宽、CIDToGIDMap 与 ToUnicode 表，返回 {资源名: 对象号}"""
+        face = self.face
+        codes = sorted(code for code in map(ord, self._used) if 0 < code < 0x10000) or [32]
+        code_to_glyph = self._subset_glyphs(codes)
+        subset_data = face.makeSubset(codes)
+        base_name = f"AAAAAA+{bytes(face.name).decode('latin-1')}"
+
+        cid_to_gid = bytearray(2 * (codes[-1] + 1))
+        for code, glyph in code_to_glyph.items():
+            cid_to_gid[2 * code:2 * code + 2] = glyph.to_bytes(2, "big")
+
+        # /W 数组：连续码位合并为一段 [起始 CID [宽度 ...]]
+        widths = face.charWidths
+        default_width = face.defaultWidth
+        w_parts = []
+        run_start, run = None, []
+        for code in codes + [None]:
+            if run and (code is None or code != run_start + len(run)):
+                w_parts.append(f"{run_start} [{' '.join(run)}]")
+                run = []
+            if code is None:
+                break
+            if not run:
+                run_start = code
+            run.append(fmt_num(widths.get(code, default_width)))
+
+        file_obj = writer.write_stream(subset_data, {"Length1": str(len(subset_data))})
+        map_obj = writer.write_stream(bytes(cid_to_gid))
+        descriptor_obj = writer.write_object(
+            f"<< /Type /FontDescriptor /FontName /{base_name} /Flags {face.flags} "
+            f"/FontBBox [{' '.join(fmt_num(v) for v in face.bbox)}] /ItalicAngle {fmt_num(face.italicAngle)} "
+            f"/Ascent {fmt_num(face.ascent)} /Descent {fmt_num(face.descent)} /CapHeight {fmt_num(face.capHeight)} "
+            f"/StemV {fmt_num(face.stemV)} /FontFile2 {file_obj} 0 R >>")
+        cid_font_obj = writer.write_object(
+            f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{base_name} "
+            f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            f"/FontDescriptor {descriptor_obj} 0 R /DW {fmt_num(default_width)} /W [{' '.join(w_parts)}] "
+            f"/CIDToGIDMap {map_obj} 0 R >>")
+        to_unicode_obj = writer.write_stream(self._to_unicode_cmap(codes))
+        font_obj = writer.write_object(
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /{base_name} /Encoding /Identity-H "
+            f"/DescendantFonts [{cid_font_obj} 0 R] /ToUnicode {to_unicode_obj} 0 R >>")
+        return {self.font_ref: font_obj}
+
+    @staticmethod
+    def _to_unicode_cmap(codes: list[int]) -> bytes:
+        """生成 CID → Unicode 映射（CID 即码位），保证文本可复制与提取"""
+        entries = [f"<{code:04X}> <{code:04X}>" for code in codes if not 0xD800 <= code <= 0xDFFF]
+        parts = [
+            "/CIDInit /ProcSet findresource begin", "12 dict begin", "begincmap",
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+            "/CMapName /Adobe-Identity-UCS def", "/CMapType 2 def",
+            "1 begincodespacerange", "<0000> <FFFF>", "endcodespacerange",
+        ]
+        for i in range(0, len(entries), 100):
+            chunk = entries[i:i + 100]
+            parts.append(f"{len(chunk)} beginbfchar")
+            parts.extend(chunk)
+            parts.append("endbfchar")
+        parts += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+        return "\n".join(parts).encode("ascii")
+
+
+class _StandardFontEncoder:
+    """标准 Type1 字体（如 Helvetica）：与 reportlab 相同，无法编码的字符依次回退到 Symbol、ZapfDingbats 等替代字体"""
+
+    def __init__(self, font_name: str, font_ref: str):
+        font = pdfmetrics.getFont(font_name)
+        self._fonts = [font] + list(getattr(font, "substitutionFonts", None) or [])
+        self._main = font
+        printable = "".join(map(chr, range(32, 127)))
+        try:
+            self._ascii_identity = printable.encode(font.encName) == printable.encode("ascii")
+        except (UnicodeEncodeError, LookupError):
+            self._ascii_identity = False
+        # 替代字体按其在回退链中的位置固定分配资源名 /F2、/F3 ...，多个编码器分别编码的页面可以直接合并
+        self._by_name = {f.fontName: f for f in self._fonts}
+        self._refs = {f.fontName: f"/F{i + 1}" for i, f in enumerate(self._fonts)}
+        self._refs[font.fontName] = font_ref
+        self._used = {font_ref: font}
+
+    def _ref(self, font) -> str:
+        """返回字体的资源名并记录为已使用"""
+        ref = self._refs.get(font.fontName)
+        if ref is None:
+            ref = self._refs[font.fontName] = f"/F{len(self._refs) + 1}"
+            self._by_name[font.fontName] = font
+        self._used.setdefault(ref, font)
+        return ref
+
+    def usage(self) -> list[str]:
+        """已用到的字体名（用于合并多个进程分别编码的页面）"""
+        return [font.fontName for font in self._used.values()]
+
+    def merge_usage(self, usage: list[str]) -> None:
+        """并入其他编码器用到的字体"""
+        for name in usage:
+            font = self._by_name.get(name) or pdfmetrics.getFont(name)
+            self._ref(font)
+
+    def show(self, text: str, font_ref: str, size: str) -> str:
+        """返回在当前字体下显示 text 的操作符（必要时临时切换到替代字体）"""
+        # 可打印 ASCII 在 WinAnsi/MacRoman 等标准编码中与自身相同，无需经过 reportlab 的查表编解码器
+        if self._ascii_identity and text.isascii() and text.isprintable():
+            return f"({_escape_literal(text.encode('ascii')).decode('ascii')}) Tj"
+        segments = pdfmetrics.unicode2T1(text, self._fonts)
+        parts = []
+        current = font_ref
+        for font, data in segments:
+            ref = self._ref(font)
+            if ref != current:
+                parts.append(f"{ref} {size} Tf")
+                current = ref
+            parts.append(f"({_escape_literal(data).decode('latin-1')}) Tj")
+        if current != font_ref:
+            parts.append(f"{font_ref} {size} Tf")
+        return " ".join(parts)
+
+    def show_lines(self, lines: list[str], font_ref: str, size: str) -> list[str]:
+        """逐行返回显示操作符"""
+        return [self.show(line, font_ref, size) for line in lines]
+
+    def write_fonts(self, writer: "DirectPDFWriter") -> dict[str, int]:
+        """写出用到的标准字体字典，返回 {资源名: 对象号}"""
+        objs = {}
+        for ref, font in self._used.items():
+            body = f"<< /Type /Font /Subtype /Type1 /BaseFont /{font.face.name}"
+            if font.encName not in ("SymbolEncoding", "ZapfDingbatsEncoding"):
+                body += f" /Encoding /{font.encName}"
+            objs[ref] = writer.write_object(body + " >>")
+        return objs
+
+
+class PageEncoder:
+    """页面内容流的文本编码器：不涉及输出文件，可在工作进程中独立编码页面，再把结果交给 DirectPDFWriter 合并"""
+
+    FONT_REF = "/F1"
+
+    def __init__(self, font_name: str, compress_level: int = 6):
+        """按字体类型选择编码方式"""
+        self.font_name = font_name
+        self.compress_level = compress_level
+        font = pdfmetrics.getFont(font_name)
+        if isinstance(font, TTFont):
+            self.encoder = _TrueTypeEncoder(font, self.FONT_REF)
+        else:
+            self.encoder = _StandardFontEncoder(font_name, self.FONT_REF)
+        self._size_strs: dict[float, str] = {}
+
+    def _size_str(self, size: float) -> str:
+        size_str = self._size_strs.get(size)
+        if size_str is None:
+            size_str = self._size_strs[size] = fmt_num(size)
+        return size_str
+
+    def show(self, text: str, size: float) -> str:
+        """返回以正文字体、指定字号显示 text 的操作符"""
+        return self.encoder.show(text, self.FONT_REF, self._size_str(size))
+
+    def show_lines(self, lines: list[str], size: float) -> list[str]:
+        """批量返回多行文本的显示操作符（与逐行 show 结果相同）"""
+        return self.encoder.show_lines(lines, self.FONT_REF, self._size_str(size))
+
+    def compress(self, content: str) -> bytes:
+        """把页面内容流编码并压缩为可直接写入的流数据"""
+        data = content.encode("latin-1")
+        return zlib.compress(data, self.compress_level) if self.compress_level else data
+
+    def usage(self):
+        """字体子集需要的使用记录（可序列化，传回主进程后用 merge_usage 合并）"""
+        return self.encoder.usage()
+
+    def merge_usage(self, usage) -> None:
+        """并入其他编码器的使用记录"""
+        self.encoder.merge_usage(usage)
+
+
+class DirectPDFWriter(PageEncoder):
+    """面向等宽排版文本页的最小 PDF 写入器
+
+    页面内容流写出后立即落盘，内存中只保留对象偏移与页面对象号；
+    字体子集、页面树与交叉引用表在 close() 时写出。
+    """
+
+    # 预留对象号：1 目录，2 页面树，3 共享资源字典（后两者在 close() 时写出）
+    _CATALOG, _PAGES, _RESOURCES = 1, 2, 3
+
+    def __init__(self, output_path: str, page_size: tuple[float, float], font_name: str,
+                 compress_level: int = 6, title: Optional[str] = None):
+        """打开临时输出文件并写入文件头（close() 时原子替换为 output_path，未完成的输出不会覆盖已有文件）"""
+        super().__init__(font_name, compress_level)
+        self.output_path = output_path
+        self.page_width, self.page_height = page_size
+        self.title = title
+
+        # 按对象号索引的文件偏移与页面对象号，用紧凑数组保存，页数很多时内存占用也很小
+        self._offsets = array('q', [0] * (self._RESOURCES + 1))
+        self._next_obj = self._RESOURCES + 1
+        self._page_objs = array('l')
+        # 表单 XObject：名称 -> 内容流（在 close() 时与字体一同写出）
+        self._forms: dict[str, str] = {}
+        self._tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        self._f = open(self._tmp_path, "wb")
+        self._pos = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+        self.write_object(f"<< /Type /Catalog /Pages {self._PAGES} 0 R >>", self._CATALOG)
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_objs)
+
+    def _write(self, data: bytes) -> None:
+        self._f.write(data)
+        self._pos += len(data)
+
+    def _alloc(self) -> int:
+        obj = self._next_obj
+        self._next_obj += 1
+        self._offsets.append(0)
+        return obj
+
+    def write_object(self, body: str, obj: Optional[int] = None) -> int:
+        """写出一个间接对象，返回对象号"""
+        obj = obj or self._alloc()
+        self._offsets[obj] = self._pos
+        self._write(f"{obj} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+        return obj
+
+    def write_stream(self, data: bytes, extra: Optional[dict[str, str]] = None, compressed: bool = False) -> int:
+        """写出一个（压缩的）流对象，返回对象号；compressed=True 表示 data 已按 compress_level 压缩"""
+        obj = self._alloc()
+        entries = dict(extra or {})
+        if self.compress_level:
+            if not compressed:
+                data = zlib.compress(data, self.compress_level)
+            entries["Filter"] = "/FlateDecode"
+        entries["Length"] = str(len(data))
+        header = " ".join(f"/{k} {v}" for k, v in entries.items())
+        self._offsets[obj] = self._pos
+        self._write(f"{obj} 0 obj\n<< {header} >>\nstream\n".encode("latin-1"))
+        self._write(data)
+        self._write(b"\nendstream\nendobj\n")
+        return obj
+
+    def add_page(self, content: str) -> None:
+        """写出一页：内容流与页面对象"""
+        self.add_encoded_page(self.compress(content))
+
+    def add_encoded_page(self, data: bytes) -> None:
+        """写出由 PageEncoder.compress 生成的页面内容流（可来自其他进程）"""
+        content_obj = self.write_stream(data, compressed=True)
+        page_obj = self.write_object(
+            f"<< /Type /Page /Parent {self._PAGES} 0 R /MediaBox [0 0 {fmt_num(self.page_width)} {fmt_num(self.page_height)}] "
+            f"/Contents {content_obj} 0 R /Resources {self._RESOURCES} 0 R >>")
+        self._page_objs.append(page_obj)
+
+    def add_form(self, name: str, content: str) -> None:
+        """定义一个覆盖整页的表单 XObject，页面内容流中以 /name Do 引用；文本须已经由本写入器编码"""
+        self._forms[name] = content
+
+    def close(self) -> None:
+        """写出字体、表单、页面树与交叉引用表并关闭文件"""
+        fonts = " ".join(f"{ref} {obj} 0 R" for ref, obj in self.encoder.write_fonts(self).items())
+        resources = f"/Font << {fonts} >> /ProcSet [/PDF /Text]"
+        if self._forms:
+            bbox = f"[0 0 {fmt_num(self.page_width)} {fmt_num(self.page_height)}]"
+            forms = " ".join(
+                f"/{name} {self.write_stream(content.encode('latin-1'), {'Type': '/XObject', 'Subtype': '/Form', 'BBox': bbox, 'Resources': f'<< {resources} >>'})} 0 R"
+                for name, content in self._forms.items())
+            resources += f" /XObject << {forms} >>"
+        self.write_object(f"<< {resources} >>", self._RESOURCES)
+        kids = " ".join(f"{obj} 0 R" for obj in self._page_objs)
+        self.write_object(f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_objs)} >>", self._PAGES)
+
+        info = "/Producer (SoftCopyRightDocGen)"
+        if self.title:
+            info += f" /Title <FEFF{self.title.encode('utf-16-be', errors='surrogatepass').hex().upper()}>"
+        info_obj = self.write_object(f"<< {info} >>")
+
+        xref_pos = self._pos
+        size = self._next_obj
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for obj in range(1, size):
+            lines.append(f"{self._offsets[obj]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {size} /Root {self._CATALOG} 0 R /Info {info_obj} 0 R >>\nstartxref\n{xref_pos}\n%%EOF\n")
+        self._write("".join(lines).encode("ascii"))
+        self._f.close()
+        os.replace(self._tmp_path, self.output_path)
+
+    def abort(self) -> None:
+        """放弃输出：关闭并删除未完成的临时文件，已有的输出文件保持不变"""
+        try:
+            self._f.close()
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
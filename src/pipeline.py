@@ -0,0 +1,799 @@
+import os
+import pathlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Callable, List, Optional
+
+from .scanner import Scanner
+from .scan_index import ScanIndex
+from .content_cache import ContentCache
+from .encoding_policy import EncodingPolicy
+
+
+class PipelineError(Exception):
+    """流水线执行失败（如未找到可用文件）"""
+
+
+class PipelineCancelled(PipelineError):
+    """流水线被取消"""
+
+    def __init__(self):
+        super().__init__("任务已取消")
+
+
+class CancelToken:
+    """取消令牌，可直接作为 check_cancel 回调传给各阶段"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        """请求取消"""
+        self._event.set()
+
+    def is_cancelled(self) -> bool:
+        """是否已请求取消"""
+        return self._event.is_set()
+
+    def __call__(self) -> bool:
+        return self._event.is_set()
+
+
+@dataclass
+class ProgressEvent:
+    """结构化进度事件；total 为 None 表示总量未知，finished 表示该阶段结束"""
+    stage: str
+    done: int
+    total: Optional[int] = None
+    bytes: int = 0
+    current: str = ""
+    elapsed: float = 0.0
+    finished: bool = False
+
+
+@dataclass
+class PipelineResult:
+    """流水线执行结果，包含各阶段耗时与计数"""
+    output_path: str
+    file_count: int = 0
+    non_empty_files: int = 0
+    total_lines: int = 0
+    bytes_read: int = 0
+    total_pages: int = 0
+    generated_pages: int = 0
+    # 估算模式下中间文件未完整读取，total_pages 与 total_lines 为估算值
+    pages_estimated: bool = False
+    # 读取阶段使用的默认解码顺序（抽样推断的结果）
+    encodings: tuple[str, ...] = ()
+    wall_time: float = 0.0
+    durations: dict[str, float] = field(default_factory=dict)
+    counters: dict[str, int] = field(default_factory=dict)
+
+
+class DocPipeline:
+    """文档生成流水线：扫描 → 读取（解码、去注释）→ 排版 → 渲染"""
+
+    STAGES = ("scan", "read", "layout", "render")
+    # 进程池读取时每个任务处理的文件数，摊薄进程间通信开销
+    READ_PROCESS_CHUNK_SIZE = 64
+    # 构建清单中保存、跳过生成时原样返回的结果字段
+    MANIFEST_RESULT_FIELDS = ("file_count", "non_empty_files", "total_lines", "bytes_read",
+                              "total_pages", "generated_pages", "pages_estimated")
+    # 估算模式下从两端向中间读取时每批提交的文件数
+    ESTIMATE_READ_BATCH = 64
+    # 读取阶段每完成多少个文件汇报一次进度
+    READ_PROGRESS_STEP = 25
+    # 流式模式下已提交但尚未交给排版的文件数上限（含乱序缓冲区）
+    STREAM_MAX_INFLIGHT = 256
+    # 流式模式下等待渲染的页面队列长度
+    STREAM_RENDER_QUEUE_SIZE = 8
+
+    def __init__(self, project_dir: str, output_path: str, software_name: str, version: str,
+                 custom_excluded_dirs: Optional[List[str]] = None, custom_excluded_exts: Optional[List[str]] = None,
+                 remove_comments: bool = False, read_processes: int = 0, use_cache: bool = True, streaming: bool = False,
+                 backend: str = "reportlab", full_export: bool = False, save_page_index: bool = False,
+                 render_processes: int = 0, layout_processes: int = 0, estimate_pages: bool = False,
+                 force: bool = False, mmap_threshold: int = Scanner.MMAP_THRESHOLD,
+                 encoding_overrides: Optional[dict[str, str]] = None, infer_encoding: bool = True,
+                 progress_callback: Optional[Callable[[ProgressEvent], None]] = None,
+                 cancel_token: Optional[CancelToken] = None):
+        """初始化流水线参数"""
+        self.project_dir = project_dir
+        self.output_path = output_path
+        self.software_name = software_name
+        self.version = version
+        self.custom_excluded_dirs = custom_excluded_dirs or []
+        self.custom_excluded_exts = custom_excluded_exts or []
+        self.remove_comments = remove_comments
+        self.read_processes = read_processes
+        self.use_cache = use_cache
+        self.streaming = streaming
+        self.backend = backend
+        # 全量导出：输出全部页面而非前后各 30 页（固定使用直接写入器逐页落盘）
+        self.full_export = full_export
+        # 在输出 PDF 旁保存页索引，供预览、局部重渲染等按页随机访问
+        self.save_page_index = save_page_index
+        # 渲染阶段的进程数，大于 1 时按页区间多进程渲染（固定使用直接写入器）
+        self.render_processes = render_processes
+        # 排版阶段的进程数，大于 1 时各文件的换行计算在进程池中并行完成
+        self.layout_processes = layout_processes
+        # 估算模式：只完整读取可能落入前 30 页与后 30 页的文件，中间文件按原始换行数估算行数
+        self.estimate_pages = estimate_pages
+        # 忽略构建清单，总是重新生成
+        self.force = force
+        # 读取阶段改用内存映射解码的文件大小阈值（字节），0 表示总是整文件读入
+        self.mmap_threshold = mmap_threshold
+        # 按目录或后缀指定的编码（键以 . 开头为后缀，否则为相对项目目录的子目录），以及是否抽样推断项目编码
+        self.encoding_overrides = encoding_overrides or {}
+        self.infer_encoding = infer_encoding
+        self.progress_callback = progress_callback
+        self.cancel_token = cancel_token or CancelToken()
+        self._generator = None
+        self._layout_cache = None
+        # 本次运行的构建指纹，比对清单后记录，生成完成后写入清单
+        self._fingerprint = None
+
+    def _emit(self, event: ProgressEvent) -> None:
+        """派发进度事件"""
+        if self.progress_callback:
+            self.progress_callback(event)
+
+    def _check_cancel(self) -> None:
+        """已请求取消时抛出 PipelineCancelled"""
+        if self.cancel_token.is_cancelled():
+            raise PipelineCancelled()
+
+    def run(self) -> PipelineResult:
+        """执行全部阶段并返回结果（streaming=True 时各阶段并发执行；估算模式优先于流式模式）
+
+        启用缓存时比对输出文件旁的构建清单，输入与参数均未变化则直接返回上次的结果（force=True 时总是重新生成）。
+        默认模式与流式模式在扫描结束时比对（读取、排版与渲染照常与扫描重叠，一致时放弃已开始的工作，
+        未完成的输出不会覆盖已有文件）；估算模式本身需要完整的文件列表，先扫描并比对，再把扫描结果交给后续阶段。
+        """
+        start = time.perf_counter()
+        result = PipelineResult(output_path=self.output_path)
+        self._fingerprint = None
+        manifest = self._create_manifest() if self.use_cache else None
+        estimate = self.estimate_pages and not self.full_export and self.render_processes <= 1
+        paths = None
+        if manifest is not None and estimate:
+            scanner, scan_index, _ = self._create_scanner()
+            paths = self._scan_all(result, scanner, scan_index)
+            if self._match_manifest(manifest, paths, result):
+                result.wall_time = time.perf_counter() - start
+                return result
+        if self.streaming and not estimate:
+            self._run_streaming(result, manifest)
+        else:
+            if estimate:
+                selected_pages = self._run_estimated(result, paths)
+                if result.total_pages:
+                    self._render(selected_pages, result)
+            else:
+                file_contents = self._scan_and_read(result, manifest)
+                if result.counters.get("build_skipped"):
+                    result.wall_time = time.perf_counter() - start
+                    return result
+                if self.render_processes > 1:
+                    self._render_parallel(file_contents, result)
+                elif self.full_export:
+                    self._render_full(file_contents, result)
+                else:
+                    selected_pages = self._layout(file_contents, result)
+                    del file_contents
+                    if result.total_pages:
+                        self._render(selected_pages, result)
+            if result.total_pages:
+                self._write_page_index(self._generator.page_index)
+        if self._fingerprint is not None and result.generated_pages and not result.counters.get("build_skipped"):
+            manifest.save(self._fingerprint, {name: getattr(result, name) for name in self.MANIFEST_RESULT_FIELDS})
+        result.wall_time = time.perf_counter() - start
+        return result
+
+    def _create_scanner(self):
+        """创建扫描器及（可选的）目录索引与内容缓存"""
+        scan_index = ScanIndex(self.project_dir) if self.use_cache else None
+        content_cache = ContentCache() if self.use_cache else None
+        scanner = Scanner(self.project_dir, custom_excluded_dirs=self.custom_excluded_dirs,
+                          custom_excluded_exts=self.custom_excluded_exts, scan_index=scan_index)
+        return scanner, scan_index, content_cache
+
+    def _create_read_executor(self):
+        """读取后端：默认多线程；设置了进程数时按批次提交到进程池，绕开 GIL"""
+        if self.read_processes > 0:
+            return ProcessPoolExecutor(max_workers=self.read_processes), self.READ_PROCESS_CHUNK_SIZE
+        return ThreadPoolExecutor(max_workers=min(32, max(4, (os.cpu_count() or 4) * 2))), 1
+
+    def _manifest_settings(self) -> dict:
+        """影响输出内容的生成参数（写入构建指纹）"""
+        return {
+            "software_name": self.software_name,
+            "version": self.version,
+            "excluded_dirs": sorted(self.custom_excluded_dirs),
+            "excluded_exts": sorted(self.custom_excluded_exts),
+            "remove_comments": self.remove_comments,
+            "backend": "direct" if self.full_export or self.render_processes > 1 else self.backend,
+            "full_export": self.full_export,
+            "estimate_pages": self.estimate_pages,
+            "encoding_overrides": dict(sorted(self.encoding_overrides.items())),
+            "infer_encoding": self.infer_encoding,
+            "save_page_index": self.save_page_index,
+        }
+
+    def _infer_encodings(self, policy: EncodingPolicy, paths, content_cache, result: PipelineResult) -> None:
+        """抽样推断项目编码，并把策略摘要写入内容缓存键（解码顺序变化后缓存的文本随之失效）"""
+        if self.infer_encoding:
+            policy.infer(paths)
+        result.encodings = policy.encodings
+        if content_cache is not None:
+            content_cache.encoding_policy = policy.key()
+
+    def _iter_inferred(self, files, policy: EncodingPolicy, content_cache, result: PipelineResult):
+        """缓冲最先扫描到的若干个文件推断项目编码，再依次产出全部文件，保证读取任务提交前策略已确定"""
+        files = iter(files)
+        head = list(islice(files, policy.SAMPLE_FILES))
+        self._infer_encodings(policy, head, content_cache, result)
+        yield from head
+        yield from files
+
+    @staticmethod
+    def _record_decoders(result: PipelineResult, decoders: Counter) -> None:
+        """把各解码器的使用次数写入计数器"""
+        for decoder, count in sorted(decoders.items()):
+            result.counters[f"decoder_{decoder}"] = count
+
+    def _create_manifest(self):
+        """创建输出文件对应的构建清单"""
+        from .build_manifest import BuildManifest
+
+        return BuildManifest(self.output_path)
+
+    def _scan_all(self, result: PipelineResult, scanner: Scanner, scan_index: Optional[ScanIndex]) -> list[pathlib.Path]:
+        """一次性扫描出有序文件列表，记录扫描耗时与目录索引计数（供估算模式使用）"""
+        scan_start = time.perf_counter()
+        paths = list(scanner.iter_scan(self.cancel_token, ordered=True))
+        self._check_cancel()
+        result.durations["scan"] = time.perf_counter() - scan_start
+        if scan_index is not None:
+            result.counters["scan_index_hits"] = scan_index.hits
+            result.counters["scan_index_misses"] = scan_index.misses
+        return paths
+
+    def _match_manifest(self, manifest, paths: list[pathlib.Path], result: PipelineResult) -> bool:
+        """计算本次的构建指纹并与清单比对，一致时把上次的结果写入 result 并标记 build_skipped"""
+        previous = self._lookup_manifest(manifest, paths)
+        if previous is None:
+            return False
+        self._apply_manifest(previous, len(paths), result)
+        return True
+
+    def _lookup_manifest(self, manifest, paths: list[pathlib.Path]) -> Optional[dict]:
+        """计算本次的构建指纹并与清单比对，一致时返回上次的生成结果（force=True 时总是返回 None）
+
+        指纹包含实际解析到的字体与排版参数，因此需要先创建生成器；本次指纹保存在 self._fingerprint，生成完成后写入清单。
+        """
+        generator = self._create_generator()
+        self._fingerprint = manifest.fingerprint(self.project_dir, paths, self._manifest_settings(),
+                                                 generator.font_name, generator.font_path, generator.layout_key())
+        return None if self.force else manifest.match(self._fingerprint)
+
+    def _apply_manifest(self, previous: dict, file_count: int, result: PipelineResult) -> None:
+        """把上次的生成结果写入 result 并标记 build_skipped"""
+        for name in self.MANIFEST_RESULT_FIELDS:
+            if name in previous:
+                setattr(result, name, previous[name])
+        result.file_count = file_count
+        result.counters["build_skipped"] = 1
+
+    def _scan_and_read(self, result: PipelineResult, manifest=None) -> list[tuple[str, str]]:
+        """扫描与读取阶段：扫描过程中即开始提交读取任务
+
+        传入构建清单时在扫描结束后比对指纹：输入未变化则取消尚未开始的读取任务、标记 build_skipped 并返回空列表。
+        """
+        check_cancel = self.cancel_token
+        scanner, scan_index, content_cache = self._create_scanner()
+
+        def scan_callback(count, current_path):
+            current = os.path.basename(str(current_path)) if current_path != "Done" else ""
+            self._emit(ProgressEvent("scan", count, current=current, elapsed=time.perf_counter() - scan_start))
+
+        executor, chunk_size = self._create_read_executor()
+        policy = EncodingPolicy(self.project_dir, self.encoding_overrides)
+
+        scan_start = time.perf_counter()
+        file_names: list[str] = []
+        paths: list[pathlib.Path] = []
+        futures = []
+        try:
+            chunk: list[tuple[int, pathlib.Path]] = []
+            files = self._iter_inferred(scanner.iter_scan(check_cancel, scan_callback, ordered=True),
+                                        policy, content_cache, result)
+            for i, f in enumerate(files):
+                file_names.append(f.name)
+                paths.append(f)
+                chunk.append((i, f))
+                if len(chunk) >= chunk_size:
+                    futures.append(executor.submit(Scanner.read_files, chunk, self.remove_comments, content_cache, self.mmap_threshold, policy))
+                    chunk = []
+            if chunk:
+                futures.append(executor.submit(Scanner.read_files, chunk, self.remove_comments, content_cache, self.mmap_threshold, policy))
+            self._check_cancel()
+
+            file_count = len(file_names)
+            result.file_count = file_count
+            result.durations["scan"] = time.perf_counter() - scan_start
+            if scan_index is not None:
+                result.counters["scan_index_hits"] = scan_index.hits
+                result.counters["scan_index_misses"] = scan_index.misses
+            self._emit(ProgressEvent("scan", file_count, file_count, elapsed=result.durations["scan"], finished=True))
+
+            if not file_count:
+                raise PipelineError("未找到符合条件的代码文件！")
+            if manifest is not None and self._match_manifest(manifest, paths, result):
+                return []
+
+            read_start = time.perf_counter()
+            results: list[tuple[str, str] | None] = [None] * file_count
+            completed = 0
+            cache_hits = 0
+            decoders: Counter = Counter()
+            for fut in as_completed(futures):
+                self._check_cancel()
+                chunk_results = fut.result()
+                for idx, content, lines, cached, nbytes, decoder in chunk_results:
+                    cache_hits += cached
+                    if decoder:
+                        decoders[decoder] += 1
+                    result.bytes_read += nbytes
+                    if content:
+                        results[idx] = (file_names[idx], content)
+                        result.total_lines += lines
+                        result.non_empty_files += 1
+
+                prev_completed = completed
+                completed += len(chunk_results)
+                step = self.READ_PROGRESS_STEP
+                if completed // step != prev_completed // step or completed == file_count:
+                    self._emit(ProgressEvent("read", completed, file_count, result.bytes_read,
+                                             current=file_names[chunk_results[-1][0]],
+                                             elapsed=time.perf_counter() - read_start))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        if content_cache is not None:
+            content_cache.prune()
+            result.counters["content_cache_hits"] = cache_hits
+            result.counters["content_cache_misses"] = file_count - cache_hits
+        self._record_decoders(result, decoders)
+        file_contents = [r for r in results if r is not None]
+        result.durations["read"] = time.perf_counter() - read_start
+        self._emit(ProgressEvent("read", file_count, file_count, result.bytes_read,
+                                 elapsed=result.durations["read"], finished=True))
+        return file_contents
+
+    def _run_estimated(self, result: PipelineResult, paths: Optional[list[pathlib.Path]] = None) -> list[list[str]]:
+        """估算模式：从两端向中间读取文件，直到分别排满前 30 页与后 30 页；
+        中间文件只统计原始字节的换行数，按两端文件的实际行数比例折算后估算总页数。
+        估算总页数不超过 60 页或两端相遇时，读取全部文件并按精确模式排版。paths 为已扫描好的有序文件列表时不再扫描。
+        """
+        scanner, scan_index, content_cache = self._create_scanner()
+        if paths is None:
+            paths = self._scan_all(result, scanner, scan_index)
+        file_count = len(paths)
+        result.file_count = file_count
+        self._emit(ProgressEvent("scan", file_count, file_count, elapsed=result.durations["scan"], finished=True))
+        if not file_count:
+            raise PipelineError("未找到符合条件的代码文件！")
+        policy = EncodingPolicy(self.project_dir, self.encoding_overrides)
+        self._infer_encodings(policy, paths, content_cache, result)
+
+        generator = self._create_generator()
+        need = 30 * generator.lines_per_page
+        executor, chunk_size = self._create_read_executor()
+        read_start = time.perf_counter()
+        contents: dict[int, str] = {}
+        wrapped: dict[int, int] = {}
+        decoders: Counter = Counter()
+
+        def read_batch(indices):
+            chunks = [[(i, paths[i]) for i in indices[j:j + chunk_size]] for j in range(0, len(indices), chunk_size)]
+            futures = [executor.submit(Scanner.read_files, chunk, self.remove_comments, content_cache, self.mmap_threshold, policy) for chunk in chunks]
+            lines = 0
+            for fut in futures:
+                for idx, content, line_count, _, nbytes, decoder in fut.result():
+                    result.bytes_read += nbytes
+                    if decoder:
+                        decoders[decoder] += 1
+                    if content:
+                        contents[idx] = content
+                        result.total_lines += line_count
+                        result.non_empty_files += 1
+                        wrapped[idx] = generator._count_wrapped_lines(
+                            list(generator._iter_source_lines(paths[idx].name, content)))
+                        lines += wrapped[idx]
+            self._check_cancel()
+            self._emit(ProgressEvent("read", len(contents), file_count, result.bytes_read,
+                                     elapsed=time.perf_counter() - read_start))
+            return lines
+
+        try:
+            batch = self.ESTIMATE_READ_BATCH
+            head_end, head_lines = 0, 0
+            while head_end < file_count and head_lines < need:
+                indices = list(range(head_end, min(head_end + batch, file_count)))
+                head_lines += read_batch(indices)
+                head_end = indices[-1] + 1
+            tail_start, tail_lines = file_count, 0
+            while tail_start > head_end and tail_lines < need:
+                indices = list(range(max(head_end, tail_start - batch), tail_start))
+                tail_lines += read_batch(indices)
+                tail_start = indices[0]
+
+            middle = list(range(head_end, tail_start))
+            estimated = 0
+            if middle:
+                # 用已读取文件的 (换行后行数 / 原始换行数) 比例折算中间文件，兼顾去注释、合并空行与自动换行的影响
+                known = sorted(wrapped)
+                raw_items = [(i, paths[i]) for i in known + middle]
+                raw_counts = dict(pair for fut in [executor.submit(Scanner.count_raw_lines, raw_items[j:j + batch])
+                                                   for j in range(0, len(raw_items), batch)]
+                                  for pair in fut.result())
+                self._check_cancel()
+                known_raw = sum(raw_counts[i] for i in known)
+                ratio = sum(wrapped.values()) / known_raw if known_raw else 1.0
+                estimated = round(sum(raw_counts[i] for i in middle) * ratio)
+
+            total_lines = head_lines + tail_lines + estimated
+            if middle and -(-total_lines // generator.lines_per_page) <= 60:
+                # 页数接近截取阈值时估算误差会影响输出内容，改为读取全部文件
+                read_batch(middle)
+                middle = []
+            if middle:
+                result.total_lines += sum(raw_counts[i] for i in middle)
+                result.non_empty_files += sum(1 for i in middle if raw_counts[i])
+                result.counters["estimated_files"] = len(middle)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        self._record_decoders(result, decoders)
+        result.durations["read"] = time.perf_counter() - read_start
+        self._emit(ProgressEvent("read", len(contents), file_count, result.bytes_read,
+                                 elapsed=result.durations["read"], finished=True))
+
+        layout_start = time.perf_counter()
+        self._emit(ProgressEvent("layout", 0, len(contents)))
+        if middle:
+            head = [(paths[i].name, contents[i]) for i in range(head_end) if i in contents]
+            tail_ids = [i for i in range(tail_start, file_count) if i in contents]
+            tail = [(paths[i].name, contents[i]) for i in tail_ids]
+            selected_pages = generator.layout_ends(head, tail, total_lines, [wrapped[i] for i in tail_ids],
+                                                   self.cancel_token)
+            total_pages = -(-total_lines // generator.lines_per_page)
+            result.pages_estimated = True
+        else:
+            file_contents = [(paths[i].name, contents[i]) for i in sorted(contents)]
+            total_pages, selected_pages = generator.layout(file_contents, self.cancel_token)
+        self._check_cancel()
+        result.total_pages = total_pages
+        result.durations["layout"] = time.perf_counter() - layout_start
+        self._emit(ProgressEvent("layout", len(contents), len(contents),
+                                 elapsed=result.durations["layout"], finished=True))
+        return selected_pages
+
+    def _create_generator(self):
+        """按需创建 PDF 生成器（延迟导入 reportlab，保证命令行冷启动速度）"""
+        if self._generator is None:
+            from .pdf_generator import PDFGenerator
+            self._generator = PDFGenerator(self.output_path, self.software_name, self.version,
+                                           use_font_cache=self.use_cache,
+                                           backend="direct" if self.full_export or self.render_processes > 1
+                                           else self.backend)
+        return self._generator
+
+    def _layout(self, file_contents: list[tuple[str, str]], result: PipelineResult) -> list[list[str]]:
+        """排版阶段：计算总页数并只排版需要输出的页面"""
+        layout_start = time.perf_counter()
+        generator = self._create_generator()
+        self._emit(ProgressEvent("layout", 0, len(file_contents)))
+        cache = self._create_layout_cache(generator)
+        if self.layout_processes > 1:
+            with generator.create_worker_pool(self.layout_processes) as executor:
+                total_pages, selected_pages = generator.layout(file_contents, self.cancel_token, executor, cache,
+                                                                  workers=self.layout_processes)
+        else:
+            total_pages, selected_pages = generator.layout(file_contents, self.cancel_token, cache=cache)
+        self._check_cancel()
+        if cache is not None:
+            result.counters["layout_cache_hits"] = cache.hits
+            result.counters["layout_cache_misses"] = cache.misses
+            result.counters["layout_reused_pages"] = cache.reused_pages
+
+        result.total_pages = total_pages
+        result.durations["layout"] = time.perf_counter() - layout_start
+        self._emit(ProgressEvent("layout", len(file_contents), len(file_contents),
+                                 elapsed=result.durations["layout"], finished=True))
+        return selected_pages
+
+    def _create_layout_cache(self, generator):
+        """按需创建排版缓存（use_cache=False 或缓存目录不可用时返回 None）"""
+        self._layout_cache = None
+        if self.use_cache:
+            from .layout_cache import LayoutCache
+            try:
+                self._layout_cache = LayoutCache(generator.layout_key(), self.output_path)
+            except OSError as e:
+                print(f"排版缓存不可用: {e}")
+        return self._layout_cache
+
+    def _render(self, selected_pages: list[list[str]], result: PipelineResult) -> None:
+        """渲染阶段：将选中的页面写入 PDF；输出页面与上次相同且输出文件未变时跳过（force=True 时总是重新写出）"""
+        render_start = time.perf_counter()
+        generator = self._create_generator()
+        self._emit(ProgressEvent("render", 0, len(selected_pages)))
+        cache = self._layout_cache
+        digest = generator.pages_digest(selected_pages) if cache is not None else None
+        if cache is not None and not self.force and cache.render_unchanged(digest, self.output_path):
+            result.counters["render_skipped"] = 1
+        elif not generator.render(selected_pages, self.cancel_token):
+            raise PipelineCancelled()
+        elif cache is not None:
+            cache.record_render(digest, self.output_path)
+        if cache is not None:
+            cache.save()
+
+        result.generated_pages = len(selected_pages)
+        result.durations["render"] = time.perf_counter() - render_start
+        self._emit(ProgressEvent("render", len(selected_pages), len(selected_pages),
+                                 elapsed=result.durations["render"], finished=True))
+
+    def _render_full(self, file_contents: list[tuple[str, str]], result: PipelineResult) -> None:
+        """全量导出：排版与渲染合并为一遍，页面逐个写盘"""
+        start = time.perf_counter()
+        generator = self._create_generator()
+        self._emit(ProgressEvent("render", 0))
+        total_pages, generated = generator.generate_full(file_contents, self.cancel_token)
+        self._check_cancel()
+        result.total_pages = total_pages
+        result.generated_pages = generated
+        result.durations["render"] = time.perf_counter() - start
+        self._emit(ProgressEvent("render", generated, generated,
+                                 elapsed=result.durations["render"], finished=True))
+
+    def _render_parallel(self, file_contents: list[tuple[str, str]], result: PipelineResult) -> None:
+        """多进程渲染：排版与渲染由工作进程按页区间完成，主进程只负责合并写盘"""
+        start = time.perf_counter()
+        generator = self._create_generator()
+        self._emit(ProgressEvent("render", 0))
+        total_pages, generated = generator.generate_parallel(file_contents, self.render_processes,
+                                                             full=self.full_export, check_cancel=self.cancel_token)
+        self._check_cancel()
+        result.total_pages = total_pages
+        result.generated_pages = generated
+        result.durations["render"] = time.perf_counter() - start
+        self._emit(ProgressEvent("render", generated, generated,
+                                 elapsed=result.durations["render"], finished=True))
+
+    def _write_page_index(self, index) -> None:
+        """按需把页索引写到输出文件旁，写入失败只提示不中断"""
+        if not self.save_page_index or index is None:
+            return
+        from .page_index import PageIndex
+        try:
+            index.save(PageIndex.default_path(self.output_path))
+        except OSError as e:
+            print(f"保存页索引失败: {e}")
+
+    def _run_streaming(self, result: PipelineResult, manifest=None) -> None:
+        """流式模式：扫描、读取、排版、渲染并发执行，阶段之间通过有界队列传递数据
+
+        扫描线程边扫描边提交读取任务，传入构建清单时在扫描结束后比对指纹，输入未变化则放弃已开始的读取与渲染；当前线程按原始顺序（乱序缓冲区）把读取结果交给流式排版；
+        渲染线程在排版产出前 30 页的同时写入 PDF，后 30 页在全部文件排版完成后写入。
+        """
+        from .pdf_generator import StreamingLayout
+
+        scanner, scan_index, content_cache = self._create_scanner()
+        executor, chunk_size = self._create_read_executor()
+        policy = EncodingPolicy(self.project_dir, self.encoding_overrides)
+        generator = self._create_generator()
+        layout = StreamingLayout(generator, full=self.full_export)
+
+        # 内部中止标志：任一线程失败或当前线程异常退出时通知其余线程
+        abort = threading.Event()
+        should_stop = lambda: abort.is_set() or self.cancel_token.is_cancelled()
+        inflight = threading.Semaphore(max(self.STREAM_MAX_INFLIGHT, chunk_size * 2))
+        done_q: queue.Queue = queue.Queue()
+        render_q: queue.Queue = queue.Queue(maxsize=self.STREAM_RENDER_QUEUE_SIZE)
+        failures: list[BaseException] = []
+        file_names: list[str] = []
+        scanned_paths: list[pathlib.Path] = []
+        start = time.perf_counter()
+
+        def scan_callback(count, current_path):
+            current = os.path.basename(str(current_path)) if current_path != "Done" else ""
+            self._emit(ProgressEvent("scan", count, current=current, elapsed=time.perf_counter() - start))
+
+        def submit(chunk):
+            # 有界提交：已提交但尚未排版的文件过多时等待，形成背压
+            for _ in chunk:
+                while not inflight.acquire(timeout=0.2):
+                    if should_stop():
+                        raise PipelineCancelled()
+            fut = executor.submit(Scanner.read_files, chunk, self.remove_comments, content_cache, self.mmap_threshold, policy)
+            fut.add_done_callback(lambda f: done_q.put(("chunk", f)))
+
+        def producer():
+            try:
+                chunk: list[tuple[int, pathlib.Path]] = []
+                files = self._iter_inferred(scanner.iter_scan(should_stop, scan_callback, ordered=True),
+                                            policy, content_cache, result)
+                for i, f in enumerate(files):
+                    file_names.append(f.name)
+                    scanned_paths.append(f)
+                    chunk.append((i, f))
+                    if len(chunk) >= chunk_size:
+                        submit(chunk)
+                        chunk = []
+                if chunk:
+                    submit(chunk)
+                result.durations["scan"] = time.perf_counter() - start
+                previous = self._lookup_manifest(manifest, scanned_paths) if manifest is not None else None
+                done_q.put(("scan_done", (len(file_names), previous)))
+            except BaseException as e:
+                done_q.put(("error", e))
+
+        def renderer():
+            c = None
+            page_num = 0
+            busy = 0.0
+            try:
+                while True:
+                    try:
+                        page = render_q.get(timeout=0.2)
+                    except queue.Empty:
+                        if should_stop():
+                            break
+                        continue
+                    if page is None:
+                        break
+                    t0 = time.perf_counter()
+                    if c is None:
+                        c = generator.begin_render()
+                    page_num += 1
+                    generator.render_page(c, page, page_num)
+                    busy += time.perf_counter() - t0
+                if c is not None:
+                    if should_stop():
+                        generator.abort_render(c)
+                        return
+                    t0 = time.perf_counter()
+                    generator.end_render(c)
+                    busy += time.perf_counter() - t0
+                result.generated_pages = page_num
+                result.durations["render"] = busy
+            except BaseException as e:
+                if c is not None:
+                    generator.abort_render(c)
+                failures.append(e)
+                abort.set()
+
+        def put_page(page):
+            while True:
+                if failures:
+                    raise failures[0]
+                self._check_cancel()
+                try:
+                    render_q.put(page, timeout=0.2)
+                    return
+                except queue.Full:
+                    continue
+
+        producer_thread = threading.Thread(target=producer, daemon=True)
+        render_thread = threading.Thread(target=renderer, daemon=True)
+        producer_thread.start()
+        render_thread.start()
+
+        completed_normally = False
+        try:
+            pending: dict[int, tuple[str, int]] = {}
+            next_idx = 0
+            file_count = None
+            cache_hits = 0
+            decoders: Counter = Counter()
+            layout_busy = 0.0
+            step = self.READ_PROGRESS_STEP
+
+            while file_count is None or next_idx < file_count:
+                if failures:
+                    raise failures[0]
+                self._check_cancel()
+                try:
+                    kind, payload = done_q.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+
+                if kind == "error":
+                    raise payload
+                if kind == "scan_done":
+                    file_count, previous = payload
+                    result.file_count = file_count
+                    if scan_index is not None:
+                        result.counters["scan_index_hits"] = scan_index.hits
+                        result.counters["scan_index_misses"] = scan_index.misses
+                    self._emit(ProgressEvent("scan", file_count, file_count,
+                                             elapsed=result.durations["scan"], finished=True))
+                    if previous is not None:
+                        # 输入未变化：放弃已开始的读取、排版与渲染（finally 中中止渲染线程），沿用上次的结果
+                        self._apply_manifest(previous, file_count, result)
+                        return
+                    if not file_count:
+                        raise PipelineError("未找到符合条件的代码文件！")
+                    continue
+
+                for idx, content, lines, cached, nbytes, decoder in payload.result():
+                    cache_hits += cached
+                    if decoder:
+                        decoders[decoder] += 1
+                    result.bytes_read += nbytes
+                    pending[idx] = (content, lines)
+
+                # 乱序缓冲区：只按原始顺序把连续的文件交给排版
+                prev_idx = next_idx
+                while next_idx in pending:
+                    content, lines = pending.pop(next_idx)
+                    if content:
+                        result.total_lines += lines
+                        result.non_empty_files += 1
+                        t0 = time.perf_counter()
+                        pages = layout.feed(file_names[next_idx], content)
+                        layout_busy += time.perf_counter() - t0
+                        for page in pages:
+                            put_page(page)
+                    next_idx += 1
+                    inflight.release()
+
+                if next_idx // step != prev_idx // step:
+                    self._emit(ProgressEvent("read", next_idx, file_count, result.bytes_read,
+                                             current=file_names[next_idx - 1], elapsed=time.perf_counter() - start))
+
+            result.durations["read"] = time.perf_counter() - start
+            if content_cache is not None:
+                content_cache.prune()
+                result.counters["content_cache_hits"] = cache_hits
+                result.counters["content_cache_misses"] = file_count - cache_hits
+            self._record_decoders(result, decoders)
+            self._emit(ProgressEvent("read", file_count, file_count, result.bytes_read,
+                                     elapsed=result.durations["read"], finished=True))
+
+            # 全部文件排版完毕后才能确定总页数与后 30 页
+            t0 = time.perf_counter()
+            total_pages, tail_pages = layout.finish(self.cancel_token)
+            layout_busy += time.perf_counter() - t0
+            self._check_cancel()
+            result.total_pages = total_pages
+            result.durations["layout"] = layout_busy
+            self._emit(ProgressEvent("layout", result.non_empty_files, result.non_empty_files,
+                                     elapsed=layout_busy, finished=True))
+
+            for page in tail_pages:
+                put_page(page)
+            put_page(None)
+            render_thread.join()
+            if failures:
+                raise failures[0]
+            self._check_cancel()
+            if result.generated_pages:
+                self._emit(ProgressEvent("render", result.generated_pages, result.generated_pages,
+                                         elapsed=result.durations["render"], finished=True))
+                self._write_page_index(layout.page_index)
+            completed_normally = True
+        finally:
+            if not completed_normally:
+                abort.set()
+            producer_thread.join()
+            render_thread.join()
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,116 @@
+import os
+import pathlib
+import sqlite3
+import json
+import threading
+import time
+from typing import Optional
+
+
+class ScanIndex:
+    """基于目录 mtime 的持久化扫描索引（SQLite），目录未变化时跳过 scandir"""
+
+    # 记录时 mtime 距当前时间过近的目录不予信任，避免同一时间刻度内的修改被漏掉
+    RACY_WINDOW_NS = 2_000_000_000
+
+    def __init__(self, root_dir: str, db_path: Optional[str] = None):
+        """初始化扫描索引并加载该项目已有的目录记录"""
+        self.root = str(pathlib.Path(root_dir).resolve())
+        self.db_path = db_path or self.default_db_path()
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[int, list[tuple[str, bool]]]] = {}
+        self._dirty: dict[str, tuple[int, list[tuple[str, bool]]]] = {}
+        self._seen: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @staticmethod
+    def default_db_path() -> str:
+        """默认索引文件路径（与 settings.db 同目录）"""
+        base = pathlib.Path(__file__).resolve().parent.parent
+        return os.path.join(base, "data", "scan_index.db")
+
+    def _connect(self) -> sqlite3.Connection:
+        """建立数据库连接并初始化表结构"""
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            "root TEXT NOT NULL, path TEXT NOT NULL, mtime_ns INTEGER NOT NULL, entries TEXT NOT NULL, "
+            "PRIMARY KEY (root, path))"
+        )
+        return conn
+
+    def _load(self) -> None:
+        """一次性读取该项目的全部目录记录到内存"""
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT path, mtime_ns, entries FROM dirs WHERE root = ?", (self.root,)
+                ).fetchall()
+            for path, mtime_ns, entries in rows:
+                self._entries[path] = (mtime_ns, [(name, bool(is_dir)) for name, is_dir in json.loads(entries)])
+        except Exception as e:
+            print(f"加载扫描索引失败，将执行完整扫描: {e}")
+            self._entries = {}
+
+    def list_dir(self, dir_path: str) -> list[tuple[str, bool]]:
+        """返回目录下的 (名称, 是否为目录) 列表，目录 mtime 未变化时直接使用索引"""
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            return []
+
+        with self._lock:
+            self._seen.add(dir_path)
+            cached = self._entries.get(dir_path)
+            if cached is not None and cached[0] == mtime_ns:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        entries = []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        entries.append((entry.name, True))
+                    elif entry.is_file(follow_symlinks=False):
+                        entries.append((entry.name, False))
+        except OSError:
+            return []
+
+        # 刚修改过的目录可能在同一时间刻度内再次变化，记为无效 mtime 以便下次重扫
+        stored_mtime = mtime_ns if time.time_ns() - mtime_ns > self.RACY_WINDOW_NS else -1
+        with self._lock:
+            self._entries[dir_path] = (stored_mtime, entries)
+            self._dirty[dir_path] = (stored_mtime, entries)
+        return entries
+
+    def save(self) -> None:
+        """写回本次扫描中变化的目录，并删除已不存在（未被访问到）的目录记录"""
+        with self._lock:
+            dirty = self._dirty
+            removed = [p for p in self._entries if p not in self._seen]
+            for p in removed:
+                del self._entries[p]
+            self._dirty = {}
+            self._seen = set()
+
+        if not dirty and not removed:
+            return
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO dirs (root, path, mtime_ns, entries) VALUES (?, ?, ?, ?)",
+                    [(self.root, p, m, json.dumps(e, ensure_ascii=False)) for p, (m, e) in dirty.items()],
+                )
+                conn.executemany(
+                    "DELETE FROM dirs WHERE root = ? AND path = ?",
+                    [(self.root, p) for p in removed],
+                )
+        except Exception as e:
+            print(f"保存扫描索引失败: {e}")
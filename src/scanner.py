@@ -1,17 +1,25 @@
 import os
 import pathlib
+import codecs
+import mmap
 # 优先使用 cchardet (C 实现，速度快 10x+)，fallback 到 chardet
 try:
     import cchardet as chardet
 except ImportError:
     import chardet
-from typing import List, Optional
+from typing import Iterator, List, Optional, TYPE_CHECKING
 
 import re
 import tokenize
 import io
 import threading
 import queue
+import time
+
+if TYPE_CHECKING:
+    from .scan_index import ScanIndex
+    from .content_cache import ContentCache
+    from .encoding_policy import EncodingPolicy
 
 class Scanner:
     # 默认排除的目录
@@ -33,6 +41,13 @@ class Scanner:
         '.mp3', '.mp4', '.avi', '.mov', '.wav'
     }
 
+    # 超过该大小（字节）的文件通过 mmap 读取并直接从映射解码，避免整文件读入再解码的多份缓冲
+    MMAP_THRESHOLD = 4 * 1024 * 1024
+    # 默认解码顺序，全部失败时再用 chardet 采样检测
+    DEFAULT_ENCODINGS = ("utf-8", "gbk")
+    # 增量解码的分块大小
+    DECODE_CHUNK_SIZE = 1 << 20
+
     # 预编译正则表达式，提高处理性能
     _C_STYLE_COMMENT_RE = re.compile(
         r'("(?:\\.|[^"\\])*"|' r"'(?:\\.|[^'\\])*')" r'|(/\*[\s\S]*?\*/|//.*)',
@@ -76,7 +91,9 @@ class Scanner:
                     if start_col > last_col:
                         out.append(" " * (start_col - last_col))
                         
-                    if token_type == tokenize.COMMENT:
+                    if token_type == tokenize.ENCODING:
+                        pass # 编码标记不是源码内容
+                    elif token_type == tokenize.COMMENT:
                         pass # 删除 # 注释
                     elif token_type == tokenize.STRING:
                         if prev_toktype in (tokenize.INDENT, tokenize.NEWLINE, tokenize.ENCODING):
@@ -145,9 +162,11 @@ class Scanner:
             
         return sorted(top_level_dirs), sorted(list(extensions))
 
-    def __init__(self, root_dir: str, custom_excluded_dirs: Optional[List[str]] = None, custom_excluded_exts: Optional[List[str]] = None):
-        """初始化扫描器实例"""
+    def __init__(self, root_dir: str, custom_excluded_dirs: Optional[List[str]] = None, custom_excluded_exts: Optional[List[str]] = None,
+                 scan_index: Optional["ScanIndex"] = None):
+        """初始化扫描器实例（可选传入 ScanIndex 以启用增量扫描）"""
         self.root_dir = pathlib.Path(root_dir)
+        self.scan_index = scan_index
         self.excluded_dirs = self.DEFAULT_EXCLUDED_DIRS.copy()
         if custom_excluded_dirs:
             self.excluded_dirs.update(custom_excluded_dirs)
@@ -162,106 +181,158 @@ class Scanner:
 
     def scan_parallel(self, check_cancel=None, progress_callback=None, max_workers: int | None = None) -> List[pathlib.Path]:
         """多线程并行扫描文件"""
-        valid_files = []
-        scanned_count = 0
-
         if not self.root_dir.exists():
             return []
 
+        valid_files = list(self.iter_scan(check_cancel=check_cancel, progress_callback=progress_callback, max_workers=max_workers))
+        if check_cancel and check_cancel():
+            return []
+        return sorted(valid_files)
+
+    def iter_scan(self, check_cancel=None, progress_callback=None, max_workers: int | None = None,
+                  ordered: bool = False) -> Iterator[pathlib.Path]:
+        """流式并行扫描：每个目录扫描完成后立即产出其中的有效文件
+
+        ordered=True 时按目录顺序逐级产出，结果顺序与 sorted(scan()) 一致；
+        否则按目录完成的先后产出，首个文件到达得更早。
+        """
+        if not self.root_dir.exists():
+            return
+
         if max_workers is None:
             # 动态计算工作线程数，上限 12
             max_workers = min(12, max(4, (os.cpu_count() or 4)))
 
-        lock = threading.Lock()
-        q: queue.Queue[str | None] = queue.Queue()
-        q.put(str(self.root_dir))
-
-        cancel_flag = threading.Event()
-        
-        # 节流控制：避免频繁触发 GUI 回调导致卡顿
-        import time
-        last_callback_time = [0.0]
-        callback_lock = threading.Lock()
-        MIN_CALLBACK_INTERVAL = 0.1  # 最小回调间隔 100ms
-
-        def throttled_callback(count, path):
-            if not progress_callback:
-                return
-            now = time.time()
-            with callback_lock:
-                if now - last_callback_time[0] < MIN_CALLBACK_INTERVAL:
-                    return
-                last_callback_time[0] = now
-            progress_callback(count, path)
+        work_q: queue.Queue[str | None] = queue.Queue()
+        done_q: queue.Queue[tuple[str, list[tuple[str, bool]], int]] = queue.Queue()
+        stop_flag = threading.Event()
+        root = str(self.root_dir)
+        work_q.put(root)
 
         def worker():
-            nonlocal scanned_count
-            while True:
-                if cancel_flag.is_set():
-                    break
+            while not stop_flag.is_set():
                 try:
-                    dir_path = q.get(timeout=0.2)
+                    dir_path = work_q.get(timeout=0.2)
                 except queue.Empty:
                     continue
+                if dir_path is None:
+                    break
+                # 每个目录都必须回报结果，否则待完成目录计数与有序输出栈永远无法清空
                 try:
-                    if dir_path is None:
-                        break
-
-                    if check_cancel and check_cancel():
-                        cancel_flag.set()
-                        continue
-
-                    try:
-                        with os.scandir(dir_path) as it:
-                            for entry in it:
-                                if cancel_flag.is_set() or (check_cancel and check_cancel()):
-                                    cancel_flag.set()
-                                    break
-
-                                name = entry.name
-                                if entry.is_dir(follow_symlinks=False):
-                                    if name.startswith('.') or name in self.excluded_dirs:
-                                        continue
-                                    q.put(entry.path)
-                                elif entry.is_file(follow_symlinks=False):
-                                    file_path = pathlib.Path(entry.path)
-                                    with lock:
-                                        scanned_count += 1
-                                        local_scanned = scanned_count
-
-                                    if self._is_valid_file(file_path):
-                                        with lock:
-                                            valid_files.append(file_path)
-                                            local_valid = len(valid_files)
-                                    else:
-                                        local_valid = None
-
-                                    # 节流汇报进度
-                                    if local_scanned % 500 == 0:
-                                        throttled_callback(local_valid if local_valid is not None else len(valid_files), file_path)
-                    except (PermissionError, FileNotFoundError, NotADirectoryError):
-                        pass
-                finally:
-                    q.task_done()
+                    entries = self._scan_dir(dir_path, sort=ordered)
+                except Exception as e:
+                    print(f"扫描目录 {dir_path} 时出错: {e}")
+                    entries = []
+                for path, is_dir in entries:
+                    if is_dir:
+                        work_q.put(path)
+                done_q.put((dir_path, entries, sum(1 for _, d in entries if d)))
 
         threads = [threading.Thread(target=worker, daemon=True) for _ in range(max_workers)]
         for t in threads:
             t.start()
 
-        q.join()
-        for _ in threads:
-            q.put(None)
-        for t in threads:
-            t.join(timeout=1)
+        # 节流控制：避免频繁触发 GUI 回调导致卡顿
+        MIN_CALLBACK_INTERVAL = 0.1  # 最小回调间隔 100ms
+        last_callback_time = 0.0
+        found_count = 0
+        pending_dirs = 1
+        # 有序模式：已完成但尚未轮到输出的目录，以及深度优先的输出栈
+        finished: dict[str, list[tuple[str, bool]]] = {}
+        stack: list = [root]
 
-        if cancel_flag.is_set():
-            return []
+        try:
+            while True:
+                if ordered:
+                    # 尽可能按目录顺序向前推进
+                    while stack:
+                        top = stack[-1]
+                        if isinstance(top, str):
+                            entries = finished.pop(top, None)
+                            if entries is None:
+                                break
+                            stack[-1] = iter(entries)
+                            continue
+                        entry = next(top, None)
+                        if entry is None:
+                            stack.pop()
+                        elif entry[1]:
+                            stack.append(entry[0])
+                        else:
+                            found_count += 1
+                            yield pathlib.Path(entry[0])
+                    if not stack:
+                        break
+                elif pending_dirs == 0:
+                    break
+
+                if check_cancel and check_cancel():
+                    return
+                try:
+                    dir_path, entries, subdir_count = done_q.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                pending_dirs += subdir_count - 1
+
+                if ordered:
+                    finished[dir_path] = entries
+                else:
+                    for path, is_dir in entries:
+                        if not is_dir:
+                            found_count += 1
+                            yield pathlib.Path(path)
+
+                if progress_callback:
+                    now = time.time()
+                    if now - last_callback_time >= MIN_CALLBACK_INTERVAL:
+                        last_callback_time = now
+                        progress_callback(found_count, dir_path)
+        finally:
+            stop_flag.set()
+            for _ in threads:
+                work_q.put(None)
+
+        # 完整扫描结束后才写回索引，避免取消时误删目录记录
+        if self.scan_index is not None:
+            self.scan_index.save()
 
         # 扫描完成汇报
         if progress_callback:
-            progress_callback(len(valid_files), "Done")
-            
-        return sorted(valid_files)
+            progress_callback(found_count, "Done")
+
+    def _scan_dir(self, dir_path: str, sort: bool = False) -> list[tuple[str, bool]]:
+        """扫描单个目录，返回 (路径, 是否为目录) 列表，已应用排除规则"""
+        entries = []
+        for name, is_dir in self._list_dir(dir_path):
+            path = os.path.join(dir_path, name)
+            if is_dir:
+                if name.startswith('.') or name in self.excluded_dirs:
+                    continue
+                entries.append((path, True))
+            elif self._is_valid_file(pathlib.Path(path)):
+                entries.append((path, False))
+
+        if sort:
+            # 与 pathlib.Path 的排序规则保持一致（Windows 下不区分大小写）
+            entries.sort(key=lambda e: os.path.normcase(os.path.basename(e[0])))
+        return entries
+
+    def _list_dir(self, dir_path: str) -> list[tuple[str, bool]]:
+        """列出目录下的 (名称, 是否为目录)，启用扫描索引时优先使用索引"""
+        if self.scan_index is not None:
+            return self.scan_index.list_dir(dir_path)
+
+        entries = []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        entries.append((entry.name, True))
+                    elif entry.is_file(follow_symlinks=False):
+                        entries.append((entry.name, False))
+        except OSError:
+            pass
+        return entries
 
     def _is_valid_file(self, file_path: pathlib.Path) -> bool:
         """根据排除规则判断文件是否有效"""
@@ -272,40 +343,130 @@ class Scanner:
             return False
         return True
 
-    @staticmethod
-    def read_file_content(file_path: pathlib.Path) -> str:
-        """自动检测编码并读取文件内容"""
+    @classmethod
+    def read_file_content(cls, file_path: pathlib.Path, mmap_threshold: int = MMAP_THRESHOLD,
+                          encodings: tuple[str, ...] = DEFAULT_ENCODINGS) -> str:
+        """自动检测编码并读取文件内容，超过 mmap_threshold 字节的文件通过内存映射直接解码（0 表示不使用）"""
+        return cls.read_file_decoded(file_path, mmap_threshold, encodings)[0]
+
+    @classmethod
+    def read_file_decoded(cls, file_path: pathlib.Path, mmap_threshold: int = MMAP_THRESHOLD,
+                          encodings: tuple[str, ...] = DEFAULT_ENCODINGS) -> tuple[str, str]:
+        """读取并解码文件，返回 (文本, 实际使用的解码器)；空文件或读取失败时解码器为空字符串"""
         try:
-            raw_data = file_path.read_bytes()
-            if not raw_data:
-                return ""
+            size = os.path.getsize(file_path)
+            if size == 0:
+                return "", ""
+            if mmap_threshold and size >= mmap_threshold:
+                with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    with memoryview(mm) as view:
+                        return cls._decode(view, encodings)
+            return cls._decode(file_path.read_bytes(), encodings)
+        except Exception as e:
+            print(f"读取文件 {file_path} 时出错: {e}")
+            return "", ""
 
-            # 优先尝试 UTF-8
+    @classmethod
+    def _decode(cls, data, encodings: tuple[str, ...] = DEFAULT_ENCODINGS) -> tuple[str, str]:
+        """按 BOM → encodings 依次尝试 → chardet 采样的顺序解码 bytes 或 memoryview，返回 (文本, 解码器)
+
+        C 实现的编解码器直接从缓冲区解码，不复制原始字节；chardet 检测出的其他编码用增量解码器分块解码。
+        """
+        head = bytes(data[:3])
+        if head == codecs.BOM_UTF8:
             try:
-                return raw_data.decode("utf-8")
+                return str(data[3:], "utf-8"), "utf-8-sig"
             except UnicodeDecodeError:
                 pass
-
-            # 尝试 GBK
+        elif head[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
             try:
-                return raw_data.decode("gbk")
+                return str(data, "utf-16"), "utf-16"
             except UnicodeDecodeError:
                 pass
 
-            # 采样前 32KB 进行深度检测，平衡速度与准确度
-            sample = raw_data[:32768] if len(raw_data) > 32768 else raw_data
-            result = chardet.detect(sample)
-            encoding = result.get('encoding') or 'utf-8'
-
+        # 按解码顺序尝试（默认先 UTF-8 后 GBK）
+        for encoding in encodings:
             try:
-                return raw_data.decode(encoding)
+                return str(data, encoding), encoding
             except (UnicodeDecodeError, LookupError):
-                # 最后手段：忽略解码错误
-                return raw_data.decode('utf-8', errors='ignore')
-                        
-        except Exception as e:
-            print(f"读取文件 {file_path} 时出错: {e}")
-            return ""
+                pass
+
+        # 采样前 32KB 进行深度检测，平衡速度与准确度
+        result = chardet.detect(bytes(data[:32768]))
+        encoding = result.get('encoding') or 'utf-8'
+
+        try:
+            return cls._decode_chunks(data, encoding), f"chardet:{encoding.lower()}"
+        except (UnicodeDecodeError, LookupError):
+            # 最后手段：忽略解码错误
+            return str(data, 'utf-8', errors='ignore'), "utf-8:ignore"
+
+    @classmethod
+    def _decode_chunks(cls, data, encoding: str) -> str:
+        """用增量解码器分块解码，避免纯 Python 实现的编解码器对整个缓冲区切片复制"""
+        decoder = codecs.getincrementaldecoder(encoding)()
+        if len(data) <= cls.DECODE_CHUNK_SIZE:
+            return decoder.decode(data, final=True)
+        parts = []
+        for pos in range(0, len(data), cls.DECODE_CHUNK_SIZE):
+            parts.append(decoder.decode(data[pos:pos + cls.DECODE_CHUNK_SIZE]))
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
+
+    @classmethod
+    def read_files(cls, items: list[tuple[int, pathlib.Path]], remove_comments: bool = False,
+                   cache: Optional["ContentCache"] = None, mmap_threshold: int = MMAP_THRESHOLD,
+                   policy: Optional["EncodingPolicy"] = None) -> list[tuple[int, str, int, bool, int, str]]:
+        """批量读取、解码并（可选）去除注释，返回 (序号, 文本, 行数, 是否命中缓存, 文件字节数, 解码器)
+
+        可直接在子进程中执行；空白文件返回空文本以减少进程间传输。policy 给出各文件的解码顺序，
+        命中缓存的文件解码器为空字符串。
+        """
+        results = []
+        for idx, path in items:
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+            nbytes = st.st_size if st is not None else 0
+
+            key = cache.key_for(path, remove_comments, st) if cache is not None and st is not None else None
+            cached = cache.get(key) if key else None
+            decoder = ""
+            if cached is not None:
+                content, line_count = cached
+            else:
+                encodings = policy.candidates(path) if policy is not None else cls.DEFAULT_ENCODINGS
+                content, decoder = cls.read_file_decoded(path, mmap_threshold, encodings)
+                if remove_comments:
+                    content = cls.remove_code_comments(content, path.suffix)
+                line_count = len(content.splitlines())
+                if key:
+                    cache.put(key, content, line_count)
+
+            if not content.strip():
+                content, line_count = "", 0
+            results.append((idx, content, line_count, cached is not None, nbytes, decoder))
+        return results
+
+    @staticmethod
+    def count_raw_lines(items: list[tuple[int, pathlib.Path]]) -> list[tuple[int, int]]:
+        """只统计原始字节中的换行数（不解码、不去注释），返回 (序号, 行数)，用于估算页数"""
+        results = []
+        for idx, path in items:
+            lines = 0
+            try:
+                with open(path, "rb") as f:
+                    last = b""
+                    while chunk := f.read(1 << 20):
+                        lines += chunk.count(b"\n")
+                        last = chunk
+                    if last and not last.endswith(b"\n"):
+                        lines += 1
+            except OSError:
+                pass
+            results.append((idx, lines))
+        return results
 
 if __name__ == "__main__":
     # Simple test
@@ -0,0 +1,5 @@
+import sys
+import pathlib
+
+# 测试直接导入 src 包（与 python -m src.cli 的用法一致），无需安装
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
@@ -0,0 +1,62 @@
+import pathlib
+
+import pytest
+
+from src.pipeline import DocPipeline
+
+pypdf = pytest.importorskip("pypdf")
+
+
+def _make_project(root: pathlib.Path, files: int = 12, lines: int = 400) -> pathlib.Path:
+    """生成一个约 75 页的小项目，包含需要自动换行的长行"""
+    for i in range(files):
+        body = []
+        for n in range(lines):
+            if n % 37 == 0:
+                body.append(f"    value_{n} = compute({', '.join(f'arg{k}' for k in range(n % 30 + 5))})")
+            else:
+                body.append(f"    line_{i}_{n} = {n} * {i}  # module {i}")
+        (root / f"module_{i:02d}.py").write_text("\n".join(body) + "\n", encoding="utf-8")
+    return root
+
+
+def _generate(project: pathlib.Path, output: pathlib.Path, **options) -> pathlib.Path:
+    pipeline = DocPipeline(str(project), str(output), "测试软件", "V1.0", use_cache=False, **options)
+    result = pipeline.run()
+    assert result.generated_pages > 0
+    return output
+
+
+def _pages_text(path: pathlib.Path) -> list[str]:
+    """逐页提取文本并归一化空白，不同后端的字符间距与换行方式不影响比较"""
+    reader = pypdf.PdfReader(str(path))
+    return [" ".join(page.extract_text().split()) for page in reader.pages]
+
+
+@pytest.fixture(scope="module")
+def project(tmp_path_factory):
+    return _make_project(tmp_path_factory.mktemp("project"))
+
+
+@pytest.fixture(scope="module")
+def reportlab_pages(project, tmp_path_factory):
+    return _pages_text(_generate(project, tmp_path_factory.mktemp("out") / "reportlab.pdf", backend="reportlab"))
+
+
+def test_direct_backend_matches_reportlab(project, reportlab_pages, tmp_path):
+    """直接写入器与 reportlab 输出的页数与逐页文本一致"""
+    direct_pages = _pages_text(_generate(project, tmp_path / "direct.pdf", backend="direct"))
+
+    assert len(reportlab_pages) == 60
+    assert "line_0_1 = 1 * 0" in reportlab_pages[0]
+    assert direct_pages == reportlab_pages
+
+
+def test_parallel_render_matches_single_process(project, reportlab_pages, tmp_path):
+    """多进程按页区间渲染与单进程渲染的页数与逐页文本一致（页码连续）"""
+    single = _generate(project, tmp_path / "single.pdf", backend="direct")
+    parallel = _generate(project, tmp_path / "parallel.pdf", render_processes=2)
+
+    assert _pages_text(parallel) == _pages_text(single)
+    assert _pages_text(parallel) == reportlab_pages
+    assert parallel.read_bytes() == single.read_bytes()
@@ -0,0 +1,65 @@
+import pathlib
+
+from src.encoding_policy import EncodingPolicy
+from src.scanner import Scanner
+
+
+def _write(path: pathlib.Path, text: str, encoding: str) -> pathlib.Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(text.encode(encoding))
+    return path
+
+
+def _decode(policy: EncodingPolicy, path: pathlib.Path) -> str:
+    return Scanner.read_file_content(path, encodings=policy.candidates(path))
+
+
+def _gbk_project(root: pathlib.Path, count: int = 70) -> list[pathlib.Path]:
+    return [_write(root / f"g{i:02d}.c", f"// 简体中文注释 {i}\nint x{i};\n", "gbk") for i in range(count)]
+
+
+def test_utf8_file_outside_sample_is_not_decoded_as_gbk(tmp_path):
+    """抽样全为 GBK 时，未抽样到的 UTF-8 文件仍按 UTF-8 解码"""
+    files = _gbk_project(tmp_path)
+    utf8_file = _write(tmp_path / "z" / "new.c", "// 测试用例\n", "utf-8")
+
+    policy = EncodingPolicy(str(tmp_path))
+    encodings = policy.infer(files[:64])
+
+    assert encodings[0] == "utf-8"
+    assert _decode(policy, utf8_file) == "// 测试用例\n"
+    assert _decode(policy, files[-1]) == "// 简体中文注释 69\nint x69;\n"
+
+
+def test_sampled_utf8_file_in_gbk_project(tmp_path):
+    """以 GBK 为主、抽样到一个 UTF-8 文件时不出现 gb18030，UTF-8 文件不被解码成乱码"""
+    files = _gbk_project(tmp_path, 12)
+    utf8_file = _write(tmp_path / "u.c", "// 中a文件\n", "utf-8")
+
+    policy = EncodingPolicy(str(tmp_path))
+    encodings = policy.infer(files + [utf8_file])
+
+    assert encodings == ("utf-8", "gbk")
+    assert _decode(policy, utf8_file) == "// 中a文件\n"
+
+
+def test_big5_project_falls_back_to_big5_before_gbk(tmp_path):
+    """Big5 项目推断出 big5 并排在 GBK 之前，避免被 GBK 无报错地解码成乱码"""
+    text = "// 繁體中文註解 測試內容\n"
+    files = [_write(tmp_path / f"b{i}.c", text, "big5") for i in range(8)]
+
+    policy = EncodingPolicy(str(tmp_path))
+    encodings = policy.infer(files)
+
+    assert encodings[:2] == ("utf-8", "big5")
+    assert _decode(policy, files[0]) == text
+
+
+def test_overrides_by_directory_and_extension(tmp_path):
+    """指定编码排在该文件解码顺序的最前面，目录优先于后缀"""
+    policy = EncodingPolicy(str(tmp_path), {".sql": "latin-1", "legacy": "big5", "legacy/gbk": "gbk"})
+
+    assert policy.candidates(tmp_path / "data.sql")[0] == "iso8859-1"
+    assert policy.candidates(tmp_path / "legacy" / "a.sql")[0] == "big5"
+    assert policy.candidates(tmp_path / "legacy" / "gbk" / "a.c")[:2] == ("gbk", "utf-8")
+    assert policy.candidates(tmp_path / "app" / "a.c") == Scanner.DEFAULT_ENCODINGS